@@ -0,0 +1,46 @@
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+from instrumentation import BUCKETS_MS, ENABLED, SLOW_QUERY_MS, reset, slow_queries, snapshot, started_at
+
+COLUMNS = ["name", "calls", "rows", "total_ms", "mean_ms", "p50_ms", "p95_ms", "max_ms"]
+KINDS = {"page": "Pages", "section": "Page Sections", "sql": "SQL Queries", "write": "Write Batches (rows = jobs)"}
+
+def metrics_page():
+    """Display request and query metrics collected by this server process."""
+    st.title("Metrics")
+    if not ENABLED:
+        st.info("Instrumentation is disabled (XPENSEAI_INSTRUMENTATION=0).")
+        return
+    st.caption(f"Collected by this server process since {started_at():%Y-%m-%d %H:%M:%S} UTC. "
+               f"Percentiles are estimated from histogram buckets.")
+    if st.button("Reset Metrics"):
+        reset()
+
+    metrics = pd.DataFrame(snapshot(), columns=["kind", *COLUMNS, "buckets"])
+    for kind, title in KINDS.items():
+        st.subheader(title)
+        rows = metrics[metrics["kind"] == kind]
+        if rows.empty:
+            st.write("Nothing recorded yet.")
+        else:
+            st.dataframe(rows[COLUMNS], hide_index=True)
+
+    if not metrics.empty:
+        st.subheader("Latency Histogram")
+        labels = metrics["kind"] + ": " + metrics["name"]
+        choice = st.selectbox("Metric", labels.index, format_func=lambda i: labels[i][:120])
+        bounds = [f"≤{bound:g} ms" for bound in BUCKETS_MS[:-1]] + [f">{BUCKETS_MS[-2]:g} ms"]
+        histogram = pd.DataFrame({"latency": bounds, "calls": metrics.loc[choice, "buckets"]})
+        st.plotly_chart(px.bar(histogram, x="latency", y="calls"))
+
+    st.subheader(f"Slow Queries (≥ {SLOW_QUERY_MS:g} ms)")
+    queries = slow_queries()
+    if not queries:
+        st.write("No slow queries recorded.")
+    for query in queries:
+        with st.expander(f"{query['ms']:.1f} ms, {query['rows']} rows: {query['sql'][:100]}"):
+            st.code(query["sql"], language="sql")
+            st.caption(f"Recorded at {query['at']}")
+            if query["plan"]:
+                st.code("\n".join(query["plan"]))
@@ -1,10 +1,41 @@
 import streamlit as st
 from db_init import init_db
-from auth import login, get_users
-from expense_input import ocr_input, text_input, csv_input
-from dashboard import dashboard
-from user_actions import savings_goals, record_payment
-from savings_prediction import savings_prediction
+from auth import login, is_admin
+from instrumentation import timer
+
+# Page modules are imported inside render_page the first time a page is
+# shown, so the login screen does not pay for pandas, plotly, the OCR stack
+# or the savings model. `python profile_startup.py` measures the difference.
+def render_page(page, user_id):
+    """Import the selected page's module on first use and render it."""
+    with timer("page", page):
+        _render_page(page, user_id)
+
+def _render_page(page, user_id):
+    if page == "Dashboard":
+        from dashboard import dashboard
+        dashboard(user_id)
+    elif page == "Add Expense":
+        from expense_input import ocr_input, text_input, csv_input, category_rules
+        ocr_input(user_id)
+        text_input(user_id)
+        csv_input(user_id)
+        category_rules(user_id)
+    elif page == "Record Payment":
+        from user_actions import record_payment
+        record_payment(user_id)
+    elif page == "Groups":
+        from user_actions import manage_groups
+        manage_groups(user_id)
+    elif page == "Savings Goals":
+        from user_actions import savings_goals
+        savings_goals(user_id)
+    elif page == "Savings Prediction":
+        from savings_prediction import savings_prediction
+        savings_prediction(user_id)
+    elif page == "Metrics" and is_admin(user_id):
+        from admin_metrics import metrics_page
+        metrics_page()
 
 def main():
     """Main application logic with navigation."""
@@ -14,26 +45,18 @@ def main():
         login()
     else:
         st.sidebar.title("Navigation")
-        page = st.sidebar.radio("Go to", ["Dashboard", "Add Expense", "Record Payment", "Savings Goals", "Savings Prediction"])
         user_id = st.session_state["user_id"]
+        pages = ["Dashboard", "Add Expense", "Record Payment", "Groups", "Savings Goals", "Savings Prediction"]
+        if is_admin(user_id):
+            pages.append("Metrics")
+        page = st.sidebar.radio("Go to", pages)
         st.write(f"Welcome, User {user_id}!")
 
         if st.sidebar.button("Logout"):
             del st.session_state["user_id"]
             st.rerun()
 
-        if page == "Dashboard":
-            dashboard(user_id)
-        elif page == "Add Expense":
-            ocr_input(user_id)
-            text_input(user_id, get_users)
-            csv_input(user_id)
-        elif page == "Record Payment":
-            record_payment(user_id)
-        elif page == "Savings Goals":
-            savings_goals(user_id)
-        elif page == "Savings Prediction":
-            savings_prediction(user_id)
+        render_page(page, user_id)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
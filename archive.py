@@ -0,0 +1,178 @@
+import os
+import argparse
+from datetime import date
+import pandas as pd
+from db import get_connection, transaction
+
+ARCHIVE_DIR = os.environ.get("XPENSEAI_ARCHIVE_DIR", "archive")
+KEEP_MONTHS = 12  # months kept in SQLite by default, counting the current one
+
+# Archived columns and their Arrow types. `month` is a generated column in
+# SQLite, so it is stored explicitly in the Parquet files.
+EXPENSE_COLUMNS = {"expense_id": "int64", "payer_id": "int64", "amount_cents": "int64", "merchant": "string",
+                   "date": "string", "month": "string", "category": "string", "import_hash": "string",
+                   "group_id": "int64"}
+SPLIT_COLUMNS = {"expense_id": "int64", "user_id": "int64", "share_cents": "int64"}
+TABLES = {"expenses": ("expenses_path", EXPENSE_COLUMNS), "expense_splits": ("splits_path", SPLIT_COLUMNS)}
+
+# pyarrow's Parquet and dataset modules are imported inside the functions
+# below, so only archiving and reads that open archived parts load them.
+def _schema(columns):
+    import pyarrow as pa
+    return pa.schema([(name, pa.type_for_alias(kind)) for name, kind in columns.items()])
+
+def _write_part(path, columns, rows):
+    """Write rows, given as tuples in `columns` order, to a zstd-compressed Parquet file."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    values = list(zip(*rows)) or [()] * len(columns)
+    table = pa.table(dict(zip(columns, map(list, values))), schema=_schema(columns))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pq.write_table(table, path, compression="zstd")
+
+def default_cutoff(keep_months=KEEP_MONTHS):
+    """Return the first month (YYYY-MM) that stays in SQLite when keeping `keep_months` months."""
+    today = date.today()
+    index = today.year * 12 + today.month - keep_months
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+def archive_month(month):
+    """Move one month's expenses and their splits out of SQLite into a new Parquet part.
+
+    Rollups, balances and contacts are left as they are, since they already
+    include these expenses. The part is only listed in archive_parts once
+    the transaction commits, so a failed run never leaves rows both in
+    SQLite and in a part that is read. Returns the number of expenses moved.
+    """
+    with transaction() as c:
+        expenses = c.execute(f"SELECT {', '.join(EXPENSE_COLUMNS)} FROM expenses WHERE month = ? "
+                             "ORDER BY group_id, expense_id", (month,)).fetchall()
+        if not expenses:
+            return 0
+        splits = c.execute("""
+            SELECT s.expense_id, s.user_id, s.share_cents
+            FROM expense_splits s JOIN expenses e USING (expense_id)
+            WHERE e.month = ? ORDER BY s.expense_id
+        """, (month,)).fetchall()
+        c.execute("INSERT INTO archive_parts (month, expenses_path, splits_path, expense_count, split_count) "
+                  "VALUES (?, '', '', ?, ?)", (month, len(expenses), len(splits)))
+        part_id = c.lastrowid
+        paths = {table: os.path.join(month, f"{table}-{part_id}.parquet") for table in TABLES}
+        c.execute("UPDATE archive_parts SET expenses_path = ?, splits_path = ? WHERE part_id = ?",
+                  (paths["expenses"], paths["expense_splits"], part_id))
+        c.execute("INSERT OR IGNORE INTO archived_import_hashes (import_hash) "
+                  "SELECT import_hash FROM expenses WHERE month = ? AND import_hash IS NOT NULL", (month,))
+        c.execute("DELETE FROM expense_splits WHERE expense_id IN (SELECT expense_id FROM expenses WHERE month = ?)",
+                  (month,))
+        c.execute("DELETE FROM expenses WHERE month = ?", (month,))
+        _write_part(os.path.join(ARCHIVE_DIR, paths["expenses"]), EXPENSE_COLUMNS, expenses)
+        _write_part(os.path.join(ARCHIVE_DIR, paths["expense_splits"]), SPLIT_COLUMNS, splits)
+    return len(expenses)
+
+def archive_before(cutoff, vacuum=False):
+    """Archive every month before `cutoff` (YYYY-MM), one transaction per month.
+
+    Undated expenses are never archived. With `vacuum`, the database file
+    is compacted afterwards so the freed pages are returned to the disk.
+    Returns {month: expenses archived}.
+    """
+    months = [row[0] for row in get_connection().execute(
+        "SELECT DISTINCT month FROM expenses WHERE month < ? ORDER BY month", (cutoff,))]
+    archived = {month: archive_month(month) for month in months}
+    if vacuum:
+        get_connection().execute("VACUUM")
+    return archived
+
+def _part_paths(path_column, months=None):
+    """Return the files holding one table's archived rows, optionally only for `months`."""
+    sql, params = f"SELECT {path_column} FROM archive_parts", ()
+    if months is not None:
+        months = list(months)
+        sql += f" WHERE month IN ({','.join('?' * len(months))})"
+        params = months
+    return [os.path.join(ARCHIVE_DIR, row[0]) for row in get_connection().execute(sql + " ORDER BY part_id", params)]
+
+def _read_table(table, columns=None, months=None, **conditions):
+    """Read archived rows as an Arrow table, or return None when there are none to read."""
+    path_column, schema_columns = TABLES[table]
+    paths = _part_paths(path_column, months)
+    if not paths:
+        return None
+    import pyarrow.dataset as ds
+    expression = None
+    for column, value in conditions.items():
+        term = ds.field(column).isin(list(value)) if isinstance(value, (list, tuple, set)) else ds.field(column) == value
+        expression = term if expression is None else expression & term
+    dataset = ds.dataset(paths, format="parquet", schema=_schema(schema_columns))
+    return dataset.to_table(columns=list(columns or schema_columns), filter=expression)
+
+def read_archive(table, columns=None, months=None, **conditions):
+    """Read archived rows of "expenses" or "expense_splits" as a DataFrame.
+
+    Only the parts for `months` (every month if None) are opened, and each
+    keyword condition (column=value, or column=list for membership) is
+    pushed down to the Parquet reader. When nothing is archived an empty
+    frame is returned without opening any file.
+    """
+    arrow = _read_table(table, columns, months, **conditions)
+    if arrow is None:
+        schema_columns = TABLES[table][1]
+        return pd.DataFrame({name: pd.Series(dtype=schema_columns[name])
+                             for name in (columns or schema_columns)})
+    return arrow.to_pandas()
+
+def restore_month(month):
+    """Move a month's archived expenses and splits back into SQLite; return how many expenses."""
+    expenses = _read_table("expenses", months=[month])
+    if expenses is None:
+        return 0
+    splits = _read_table("expense_splits", months=[month])
+    columns = [name for name in EXPENSE_COLUMNS if name != "month"]
+    paths = get_connection().execute(
+        "SELECT expenses_path, splits_path FROM archive_parts WHERE month = ?", (month,)).fetchall()
+    with transaction() as c:
+        c.executemany(f"INSERT INTO expenses ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                      zip(*(expenses.column(name).to_pylist() for name in columns)))
+        c.executemany("INSERT INTO expense_splits (expense_id, user_id, share_cents) VALUES (?, ?, ?)",
+                      zip(*(splits.column(name).to_pylist() for name in SPLIT_COLUMNS)))
+        c.execute("DELETE FROM archived_import_hashes WHERE import_hash IN "
+                  "(SELECT import_hash FROM expenses WHERE month = ? AND import_hash IS NOT NULL)", (month,))
+        c.execute("DELETE FROM archive_parts WHERE month = ?", (month,))
+    for path in (path for pair in paths for path in pair):
+        try:
+            os.remove(os.path.join(ARCHIVE_DIR, path))
+        except FileNotFoundError:
+            pass
+    try:
+        os.rmdir(os.path.join(ARCHIVE_DIR, month))
+    except OSError:
+        pass
+    return expenses.num_rows
+
+def archived_months():
+    """Return one row per archived month with its part, expense and split counts."""
+    return pd.read_sql_query(
+        "SELECT month, COUNT(*) AS parts, SUM(expense_count) AS expenses, SUM(split_count) AS splits "
+        "FROM archive_parts GROUP BY month ORDER BY month", get_connection())
+
+if __name__ == "__main__":
+    from db_init import init_db
+
+    parser = argparse.ArgumentParser(description="Move closed months of expenses to Parquet files and back.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    archive = commands.add_parser("archive", help="archive every month before a cutoff")
+    archive.add_argument("--before", help=f"first month to keep, YYYY-MM (default: keep {KEEP_MONTHS} months)")
+    archive.add_argument("--vacuum", action="store_true", help="compact the database file afterwards")
+    restore = commands.add_parser("restore", help="move an archived month back into the database")
+    restore.add_argument("month", help="YYYY-MM")
+    commands.add_parser("list", help="show the archived months")
+    args = parser.parse_args()
+
+    init_db()
+    if args.command == "archive":
+        archived = archive_before(args.before or default_cutoff(), args.vacuum)
+        print(f"Archived {sum(archived.values())} expenses from {len(archived)} months to {ARCHIVE_DIR}/.")
+    elif args.command == "restore":
+        print(f"Restored {restore_month(args.month)} expenses from {args.month}.")
+    else:
+        print(archived_months().to_string(index=False))
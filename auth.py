@@ -1,31 +1,41 @@
+import os
 import streamlit as st
 import sqlite3
+from db import get_connection, transaction
 
 def check_credentials(username, password):
     """Verify user credentials against the database."""
-    conn = sqlite3.connect("xpenseai.db")
-    c = conn.cursor()
+    c = get_connection().cursor()
     c.execute("SELECT user_id FROM users WHERE username = ? AND password = ?", (username, password))
     user = c.fetchone()
-    conn.close()
     return user[0] if user else None
 
+def is_admin(user_id):
+    """Return whether a user may see the admin pages.
+
+    Admins are flagged in users.is_admin. Usernames listed in the
+    comma-separated XPENSEAI_ADMINS environment variable also count, which
+    is how the first admin is set up.
+    """
+    row = get_connection().execute("SELECT username, is_admin FROM users WHERE user_id = ?", (user_id,)).fetchone()
+    if row is None:
+        return False
+    admins = {name.strip() for name in os.environ.get("XPENSEAI_ADMINS", "").split(",") if name.strip()}
+    return bool(row[1]) or row[0] in admins
+
 def register_user(username, password, email):
     """Register a new user in the database."""
-    conn = sqlite3.connect("xpenseai.db")
-    c = conn.cursor()
     try:
-        c.execute("INSERT INTO users (username, password, email) VALUES (?, ?, ?)",
-                  (username, password, email))
-        conn.commit()
-        user_id = c.lastrowid  # Get the ID of the newly inserted user
-        st.session_state["user_id"] = user_id  # Set user_id immediately
-        st.success(f"User {username} registered successfully! Logging you in...")
-        st.rerun()  # Re-run to switch to main interface
+        with transaction() as c:
+            c.execute("INSERT INTO users (username, password, email) VALUES (?, ?, ?)",
+                      (username, password, email))
+            user_id = c.lastrowid  # Get the ID of the newly inserted user
     except sqlite3.IntegrityError:
         st.error("Username already exists. Please choose a different username.")
-    finally:
-        conn.close()
+        return
+    st.session_state["user_id"] = user_id  # Set user_id immediately
+    st.success(f"User {username} registered successfully! Logging you in...")
+    st.rerun()  # Re-run to switch to main interface
 
 def login():
     """Display login page and handle authentication."""
@@ -52,12 +62,3 @@ def login():
                 register_user(new_username, new_password, new_email if new_email else None)
             else:
                 st.error("Username and password are required!")
-
-def get_users():
-    """Retrieve list of user IDs from the database."""
-    conn = sqlite3.connect("xpenseai.db")
-    c = conn.cursor()
-    c.execute("SELECT user_id FROM users")
-    users = [row[0] for row in c.fetchall()]
-    conn.close()
-    return users
\ No newline at end of file
@@ -0,0 +1,264 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from db import get_connection, set_db_path
+from synthetic_data import SCALES, generate, merchant_names
+
+def measure(func, repeat=5, warmup=1):
+    """Time `func()` `repeat` times after `warmup` untimed calls; return stats in milliseconds."""
+    for _ in range(warmup):
+        func()
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - started) * 1000)
+    return {"min_ms": round(min(times), 3), "median_ms": round(statistics.median(times), 3),
+            "mean_ms": round(statistics.fmean(times), 3), "repeat": repeat}
+
+def busiest_user():
+    """Return the user with the most expenses, the worst case for per-user queries."""
+    return get_connection().execute(
+        "SELECT payer_id FROM expenses GROUP BY payer_id ORDER BY COUNT(*) DESC LIMIT 1").fetchone()[0]
+
+def bench_ledger(repeat):
+    """Time the read paths behind the dashboard."""
+    from analysis import calculate_debts, personal_finance, spending_by_category
+    from groups import user_groups
+    from ledger import compute_balances
+    user_id = busiest_user()
+    group_ids = [group_id for group_id, _ in user_groups(user_id)]
+    return {
+        "calculate_debts": measure(lambda: [calculate_debts(group_id) for group_id in group_ids], repeat),
+        "compute_group_balances": measure(lambda: [compute_balances(group_id) for group_id in group_ids], repeat),
+        "personal_finance": measure(lambda: personal_finance(user_id), repeat),
+        "dashboard_queries": measure(lambda: (personal_finance(user_id), spending_by_category(user_id),
+                                              [calculate_debts(group_id) for group_id in group_ids]), repeat),
+    }
+
+def bench_writes(n, threads):
+    """Time `n` single-expense writes from `threads` concurrent callers.
+
+    The same writes are made once with a transaction per caller and once
+    through the write queue. Writes that fail with "database is locked"
+    are counted, not retried.
+    """
+    from db import transaction
+    from ledger import add_expense
+    from write_queue import run as queued_write
+    user_id = busiest_user()
+
+    def direct(i):
+        with transaction() as c:
+            add_expense(c, user_id, 1.0, f"Bench {i}", "2025-01-01", "Food", [(user_id, 1.0)])
+
+    def queued(i):
+        queued_write(add_expense, user_id, 1.0, f"Bench {i}", "2025-01-01", "Food", [(user_id, 1.0)])
+
+    def attempt(write, i):
+        try:
+            write(i)
+            return True
+        except sqlite3.OperationalError:
+            return False
+
+    results = {}
+    for name, write in (("writes_direct", direct), ("writes_queued", queued)):
+        with ThreadPoolExecutor(threads) as pool:
+            started = time.perf_counter()
+            succeeded = sum(pool.map(lambda i: attempt(write, i), range(n)))
+            seconds = time.perf_counter() - started
+        results[name] = {"writes": n, "threads": threads, "ms": round(seconds * 1000, 3),
+                         "writes_per_second": round(n / seconds), "failed": n - succeeded}
+    return results
+
+def bench_csv_import(rows, repeat):
+    """Time CSV import of `rows` new expenses, each run into a fresh payer."""
+    from csv_import import import_csv
+    rng = np.random.default_rng(0)
+    merchants = merchant_names()
+    user_ids = [row[0] for row in get_connection().execute("SELECT user_id FROM users ORDER BY user_id LIMIT ?",
+                                                           (repeat + 1,))]
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "expenses.csv")
+        pd.DataFrame({
+            "date": pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 365, size=rows), unit="D"),
+            "merchant": rng.choice(merchants, size=rows),
+            "amount": (rng.integers(100, 20000, size=rows) / 100).round(2),
+            "category": None,
+        }).to_csv(path, index=False, header=False)
+        for user_id in user_ids[:repeat]:
+            results.append(import_csv(path, user_id))
+    seconds = [stats["seconds"] for stats in results]
+    return {"csv_import": {"rows": rows, "min_ms": round(min(seconds) * 1000, 3),
+                           "median_ms": round(statistics.median(seconds) * 1000, 3),
+                           "rows_per_second": round(rows / min(seconds)), "repeat": len(results)}}
+
+def bench_categorizer(n, repeat):
+    """Time categorize_expense on `n` distinct merchant names per run, cold and warm."""
+    from categorizer import categorize_expense
+    runs = iter(range(repeat + 1))
+
+    def cold():
+        run = next(runs)
+        for i in range(n):
+            categorize_expense(f"Merchant {run} {i} Cafe")
+
+    def warm():
+        for i in range(n):
+            categorize_expense(f"Merchant 0 {i} Cafe")
+
+    return {"categorize_expense_cold": {**measure(cold, repeat), "calls": n},
+            "categorize_expense_warm": {**measure(warm, repeat), "calls": n}}
+
+def bench_prediction(rows, repeat):
+    """Time model loading, single-row preprocess_input + predict, a batch predict and a scenario grid."""
+    from savings_batch import DEFAULT_INPUT, load_artifacts, predict_frame, preprocess_batch, scenario_grid
+    from savings_prediction import preprocess_input
+    started = time.perf_counter()
+    model, scaler, encoder = load_artifacts()
+    load_ms = (time.perf_counter() - started) * 1000
+    frame = pd.DataFrame([DEFAULT_INPUT] * rows)
+    return {
+        "model_load": {"ms": round(load_ms, 3)},
+        "predict_single": measure(lambda: model.predict(preprocess_input(DEFAULT_INPUT, scaler, encoder), verbose=0),
+                                  repeat * 20),
+        "predict_batch": {**measure(lambda: model.predict(preprocess_batch(frame, scaler, encoder),
+                                                          batch_size=1024, verbose=0), repeat), "rows": rows},
+        "predict_scenario_grid": {**measure(lambda: predict_frame(
+            scenario_grid(DEFAULT_INPUT, "Income", np.linspace(0, 100_000, 100),
+                          "Eating_Out", np.linspace(0, 5_000, 100)), model, scaler, encoder), repeat), "rows": 10_000},
+    }
+
+def bench_recurring(users):
+    """Time a full recurring-charge detection, then an incremental run after one new expense each for `users` users.
+
+    Runs on a copy of the database, so the added expenses, the detected
+    series and the recurring watermark do not reach the benchmarked one.
+    """
+    import db
+    from db import transaction
+    from ledger import add_expense
+    from recurring import update_recurring
+    original = db.DB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        copy = os.path.join(tmp, "recurring.db")
+        target = sqlite3.connect(copy)
+        get_connection().backup(target)
+        target.close()
+        set_db_path(copy)
+        try:
+            started = time.perf_counter()
+            full = update_recurring(full=True)
+            full_ms = (time.perf_counter() - started) * 1000
+            user_ids = [row[0] for row in get_connection().execute("SELECT user_id FROM users LIMIT ?", (users,))]
+            with transaction() as c:
+                for user_id in user_ids:
+                    add_expense(c, user_id, 9.99, "Streaming Service", "2025-12-01", "Entertainment",
+                                [(user_id, 9.99)])
+            started = time.perf_counter()
+            update_recurring()
+            incremental_ms = (time.perf_counter() - started) * 1000
+        finally:
+            set_db_path(original)
+    return {"recurring_full": {"ms": round(full_ms, 3), "series": full["series"]},
+            "recurring_incremental": {"ms": round(incremental_ms, 3), "users": len(user_ids)}}
+
+def git_revision():
+    """Return the current commit hash, or None outside a git checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+@contextmanager
+def benchmark_db(scale="10k", db=None, seed=0):
+    """Point the data-access layer at a fresh synthetic database, or at `db`, for the block.
+
+    Yields {"dataset": generator stats or None, "rows": table sizes}, the
+    data-size part of the report.
+    """
+    from db_init import init_db
+    with tempfile.TemporaryDirectory() as tmp:
+        set_db_path(db or os.path.join(tmp, "bench.db"))
+        try:
+            init_db()
+            dataset = None
+            if db is None:
+                dataset = generate(seed=seed, **SCALES[scale])
+            counts = {table: get_connection().execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                      for table in ("users", "expenses", "expense_splits", "payments")}
+            yield {"dataset": dataset, "rows": counts}
+        finally:
+            set_db_path(os.environ.get("XPENSEAI_DB", "xpenseai.db"))
+
+def report(scale, db, sizes, results):
+    """Return the JSON-serialisable report for `results` measured on a benchmark_db."""
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": scale if db is None else None,
+        **sizes,
+        "results": results,
+    }
+
+def run(scale="10k", db=None, repeat=5, csv_rows=20_000, seed=0):
+    """Build (or reuse) a synthetic database and run every benchmark against it.
+
+    Returns a JSON-serialisable report with the environment, the data sizes
+    before any benchmark ran and one timing entry per benchmark.
+    """
+    with benchmark_db(scale, db, seed) as sizes:
+        results = {}
+        results.update(bench_ledger(repeat))
+        results.update(bench_writes(2_000, 16))
+        results.update(bench_categorizer(10_000, repeat))
+        results.update(bench_prediction(10_000, repeat))
+        results.update(bench_csv_import(csv_rows, min(repeat, 3)))
+        results.update(bench_recurring(100))
+    return report(scale, db, sizes, results)
+
+def compare(baseline, current):
+    """Return {benchmark: current/baseline median ratio} for benchmarks in both reports."""
+    ratios = {}
+    for name, entry in current["results"].items():
+        old = baseline["results"].get(name, {})
+        key = "median_ms" if "median_ms" in entry else "ms"
+        if old.get(key):
+            ratios[name] = round(entry[key] / old[key], 3)
+    return ratios
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the core XpenseAI code paths.")
+    parser.add_argument("--scale", choices=SCALES, default="10k", help="synthetic dataset size (default: 10k)")
+    parser.add_argument("--db", help="benchmark an existing database instead (it is written to by the CSV import)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--csv-rows", type=int, default=20_000)
+    parser.add_argument("--output", default="benchmark_results.json", help="where to write the JSON report")
+    parser.add_argument("--compare", help="earlier JSON report to compare against")
+    args = parser.parse_args()
+
+    report = run(args.scale, args.db, args.repeat, args.csv_rows)
+    if args.compare:
+        with open(args.compare) as f:
+            report["compared_to"] = {"path": args.compare, "ratios": compare(json.load(f), report)}
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    json.dump(report["results"] if not args.compare else report["compared_to"], sys.stdout, indent=2)
+    print(f"\nWrote {args.output}")
@@ -0,0 +1,185 @@
+import sys
+import json
+import time
+import random
+from collections import deque
+from functools import lru_cache
+import pandas as pd
+from db import bump_version, get_connection, get_version
+
+UNCATEGORIZED = "Uncategorized"
+NO_MATCH = sys.maxsize
+RULES_TTL = 1.0  # seconds between checks of the rules version
+
+_matchers = {}
+_loaded_version = None
+_checked_at = None
+
+def build_matcher(rules):
+    """Compile (keyword, category) rules into one Aho-Corasick automaton.
+
+    Rules are given in precedence order. Matching walks the text once, so its
+    cost depends on the text length, not on how many rules there are.
+    Returns (goto, fail, best, categories) where best[state] is the index of
+    the highest-precedence rule ending at that state or any of its suffixes.
+    """
+    goto, fail, best = [{}], [0], [NO_MATCH]
+    for index, (keyword, _) in enumerate(rules):
+        keyword = keyword.lower()
+        if not keyword:
+            continue
+        state = 0
+        for ch in keyword:
+            if ch not in goto[state]:
+                goto[state][ch] = len(goto)
+                goto.append({})
+                fail.append(0)
+                best.append(NO_MATCH)
+            state = goto[state][ch]
+        best[state] = min(best[state], index)
+
+    queue = deque(goto[0].values())
+    while queue:
+        state = queue.popleft()
+        for ch, child in goto[state].items():
+            queue.append(child)
+            link = fail[state]
+            while link and ch not in goto[link]:
+                link = fail[link]
+            if state:
+                fail[child] = goto[link].get(ch, 0)
+            best[child] = min(best[child], best[fail[child]])
+    return goto, fail, best, [category for _, category in rules]
+
+def match(matcher, text):
+    """Return the category of the highest-precedence rule found in `text`, or None."""
+    goto, fail, best, categories = matcher
+    state, found = 0, NO_MATCH
+    for ch in text:
+        while state and ch not in goto[state]:
+            state = fail[state]
+        state = goto[state].get(ch, 0)
+        if best[state] < found:
+            found = best[state]
+    return categories[found] if found != NO_MATCH else None
+
+def load_rules(user_id=None, group_id=None):
+    """Load the keyword rules that apply to a user within a group, in precedence order.
+
+    The user's own rules come first, then the group's rules, then global
+    rules; within each scope higher priority wins, then the older rule.
+    """
+    c = get_connection().execute("""
+        SELECT keyword, category FROM category_rules
+        WHERE user_id = ? OR group_id = ? OR (user_id IS NULL AND group_id IS NULL)
+        ORDER BY user_id IS NULL, group_id IS NULL, priority DESC, rule_id
+    """, (user_id, group_id))
+    return c.fetchall()
+
+def _refresh():
+    """Drop compiled matchers and memoized results if the rules changed.
+
+    The rules version is read at most once every RULES_TTL seconds, so
+    cached lookups do not touch the database. add_rule and delete_rule
+    force a check on the next call.
+    """
+    global _loaded_version, _checked_at
+    now = time.monotonic()
+    if _checked_at is not None and now - _checked_at < RULES_TTL:
+        return
+    _checked_at = now
+    version = get_version("category_rules")
+    if version != _loaded_version:
+        _matchers.clear()
+        _categorize_cached.cache_clear()
+        _loaded_version = version
+
+def get_matcher(user_id=None, group_id=None):
+    """Return the compiled matcher for a user's rules within a group, building it on first use."""
+    key = (user_id, group_id)
+    if key not in _matchers:
+        _matchers[key] = build_matcher(load_rules(user_id, group_id))
+    return _matchers[key]
+
+@lru_cache(maxsize=8192)
+def _categorize_cached(user_id, group_id, merchant):
+    return match(get_matcher(user_id, group_id), merchant.lower()) or UNCATEGORIZED
+
+def categorize_expense(merchant, user_id=None, group_id=None):
+    """Categorize an expense based on merchant name."""
+    _refresh()
+    return _categorize_cached(user_id, group_id, merchant or "")
+
+def categorize_series(merchants, user_id=None, group_id=None):
+    """Categorize a whole column of merchant names, once per distinct name."""
+    _refresh()
+    merchants = merchants.fillna("").astype(str)
+    unique = pd.unique(merchants)
+    lookup = {merchant: _categorize_cached(user_id, group_id, merchant) for merchant in unique}
+    return merchants.map(lookup)
+
+def list_categories():
+    """Return every category name, with Uncategorized last."""
+    names = [row[0] for row in get_connection().execute("SELECT name FROM categories ORDER BY category_id")]
+    return [name for name in names if name != UNCATEGORIZED] + [UNCATEGORIZED]
+
+def add_rule(c, keyword, category, user_id=None, priority=0, group_id=None):
+    """Add a user's or a group's keyword rule (global when both are None) and invalidate caches.
+
+    The caller owns the transaction, as with ledger.add_expense.
+    """
+    global _checked_at
+    c.execute("INSERT OR IGNORE INTO categories (name) VALUES (?)", (category,))
+    c.execute("INSERT INTO category_rules (user_id, group_id, keyword, category, priority) VALUES (?, ?, ?, ?, ?)",
+              (user_id, group_id, keyword.lower().strip(), category, priority))
+    rule_id = c.lastrowid
+    bump_version(c, "category_rules")
+    _checked_at = None
+    return rule_id
+
+def delete_rule(c, rule_id, user_id=None, group_id=None):
+    """Delete one of a user's or a group's rules and invalidate caches, inside the caller's transaction."""
+    global _checked_at
+    c.execute("DELETE FROM category_rules WHERE rule_id = ? AND user_id IS ? AND group_id IS ?",
+              (rule_id, user_id, group_id))
+    bump_version(c, "category_rules")
+    _checked_at = None
+
+def list_rules(user_id=None, group_id=None):
+    """Return a user's own rules, or a group's rules, as a DataFrame."""
+    return pd.read_sql_query("SELECT rule_id, keyword, category, priority FROM category_rules "
+                             "WHERE user_id IS ? AND group_id IS ? ORDER BY priority DESC, rule_id",
+                             get_connection(), params=(user_id, group_id))
+
+def benchmark(rule_counts=(10, 100, 1000, 10000), merchants=20000, seed=0):
+    """Compare the compiled matcher against a substring check per rule.
+
+    Runs without a database on random keywords and merchant names and
+    returns merchants per second for both approaches at each rule count.
+    """
+    rng = random.Random(seed)
+    word = lambda: "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(4, 9)))
+    names = [f"{word()} {word()} {rng.randint(1, 999)}" for _ in range(merchants)]
+    results = []
+    for count in rule_counts:
+        rules = [(word(), f"cat{i % 20}") for i in range(count)]
+        started = time.perf_counter()
+        matcher = build_matcher(rules)
+        build_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for name in names:
+            match(matcher, name)
+        compiled = merchants / (time.perf_counter() - started)
+
+        sample = names[:max(200, merchants * 10 // count)] if count > 100 else names
+        started = time.perf_counter()
+        for name in sample:
+            next((category for keyword, category in rules if keyword in name), None)
+        naive = len(sample) / (time.perf_counter() - started)
+        results.append({"rules": count, "build_seconds": round(build_seconds, 4),
+                        "compiled_per_second": round(compiled), "substring_per_second": round(naive)})
+    return results
+
+if __name__ == "__main__":
+    print(json.dumps(benchmark(), indent=2))
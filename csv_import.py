@@ -0,0 +1,121 @@
+import argparse
+import hashlib
+import time
+import pandas as pd
+from categorizer import categorize_series
+from db import transaction
+from ledger import add_to_rollups, normalize_date
+
+CSV_COLUMNS = ["date", "merchant", "amount", "category"]
+
+def _prepare_chunk(chunk, payer_id, seen):
+    """Clean one chunk and attach a content hash to every valid row.
+
+    The hash covers the payer, date, merchant, amount and how many identical
+    rows came before it in the file, so re-importing a file is a no-op while
+    genuine repeats (two coffees on the same day) are still kept. `seen`
+    carries those counts across chunks. Rows without a date are kept with
+    an empty date, which is stored as NULL.
+    """
+    chunk = chunk.assign(amount_cents=pd.to_numeric(chunk["amount"], errors="coerce").mul(100).round())
+    chunk = chunk[chunk["amount_cents"].notna()].copy()
+    if chunk.empty:
+        return chunk
+    chunk["amount_cents"] = chunk["amount_cents"].astype("int64")
+
+    # An all-blank date column is read as float NaN; blank the missing dates
+    # so the hash key is always a string.
+    dates = chunk["date"].fillna("").astype(str)
+    unique_dates = pd.unique(dates)
+    chunk["date"] = dates.map(dict(zip(unique_dates, map(normalize_date, unique_dates))))
+    chunk["merchant"] = chunk["merchant"].fillna("").astype(str).str.strip()
+
+    missing = chunk["category"].isna()
+    chunk.loc[missing, "category"] = categorize_series(chunk.loc[missing, "merchant"], payer_id)
+
+    key = chunk["date"] + "\x1f" + chunk["merchant"] + "\x1f" + chunk["amount_cents"].astype(str)
+    occurrence = key.groupby(key).cumcount() + key.map(seen).fillna(0).astype("int64")
+    for value, count in key.value_counts().items():
+        seen[value] = seen.get(value, 0) + count
+    chunk["import_hash"] = [hashlib.sha1(f"{payer_id}\x1f{k}\x1f{n}".encode()).hexdigest()
+                            for k, n in zip(key, occurrence)]
+    return chunk
+
+def _existing_hashes(c, hashes, batch=500):
+    """Return the subset of `hashes` that is already stored, including archived expenses."""
+    found = set()
+    for start in range(0, len(hashes), batch):
+        part = hashes[start:start + batch]
+        placeholders = ",".join("?" * len(part))
+        c.execute(f"SELECT import_hash FROM expenses WHERE import_hash IN ({placeholders}) "
+                  f"UNION ALL SELECT import_hash FROM archived_import_hashes WHERE import_hash IN ({placeholders})",
+                  part + part)
+        found.update(row[0] for row in c.fetchall())
+    return found
+
+def _insert_chunk(chunk, payer_id):
+    """Insert the new rows of a prepared chunk in one transaction; return the count."""
+    with transaction() as c:
+        existing = _existing_hashes(c, chunk["import_hash"].tolist())
+        new = chunk[~chunk["import_hash"].isin(existing)].drop_duplicates("import_hash")
+        if new.empty:
+            return 0
+        c.execute("SELECT COALESCE(MAX(expense_id), 0) FROM expenses")
+        last_id = c.fetchone()[0]
+        c.executemany(
+            "INSERT INTO expenses (payer_id, amount_cents, merchant, date, category, import_hash) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            zip([payer_id] * len(new), new["amount_cents"].tolist(), new["merchant"].tolist(),
+                [date or None for date in new["date"].tolist()], new["category"].tolist(), new["import_hash"].tolist()))
+        # Imported expenses are paid and owed in full by the importer, so the
+        # splits can be copied straight from the rows just inserted and the
+        # balances do not change.
+        c.execute("""
+            INSERT INTO expense_splits (expense_id, user_id, share_cents)
+            SELECT expense_id, payer_id, amount_cents FROM expenses WHERE expense_id > ?
+        """, (last_id,))
+        add_to_rollups(c, last_id + 1)
+        return len(new)
+
+def import_csv(source, payer_id, chunksize=5000, progress=None):
+    """Stream a CSV of expenses (date, merchant, amount, category) into the database.
+
+    The file is read `chunksize` rows at a time; each chunk is categorized
+    and inserted with executemany in its own transaction. Rows that were
+    already imported are skipped. `progress` is called after every chunk
+    with the running totals, which are also returned.
+    """
+    stats = {"rows": 0, "inserted": 0, "skipped": 0, "invalid": 0, "seconds": 0.0, "rows_per_second": 0.0}
+    seen = {}
+    started = time.perf_counter()
+    for chunk in pd.read_csv(source, names=CSV_COLUMNS, chunksize=chunksize, dtype={"date": str, "merchant": str, "category": str}):
+        prepared = _prepare_chunk(chunk, payer_id, seen)
+        inserted = _insert_chunk(prepared, payer_id) if not prepared.empty else 0
+
+        stats["rows"] += len(chunk)
+        stats["invalid"] += len(chunk) - len(prepared)
+        stats["inserted"] += inserted
+        stats["skipped"] += len(prepared) - inserted
+        stats["seconds"] = time.perf_counter() - started
+        stats["rows_per_second"] = stats["rows"] / stats["seconds"] if stats["seconds"] else 0.0
+        if progress:
+            progress(dict(stats))
+    return stats
+
+def _print_progress(stats):
+    """Print one progress line for the command-line importer."""
+    print(f"{stats['rows']} rows read, {stats['inserted']} inserted, "
+          f"{stats['skipped']} duplicates, {stats['invalid']} invalid "
+          f"({stats['rows_per_second']:.0f} rows/s)")
+
+if __name__ == "__main__":
+    from db_init import init_db
+
+    parser = argparse.ArgumentParser(description="Bulk import expenses from a CSV file.")
+    parser.add_argument("path", help="CSV file with date, merchant, amount, category columns")
+    parser.add_argument("--user", type=int, required=True, help="user_id of the payer")
+    parser.add_argument("--chunksize", type=int, default=5000)
+    args = parser.parse_args()
+
+    init_db()
+    import_csv(args.path, args.user, args.chunksize, progress=_print_progress)
@@ -1,32 +1,56 @@
+from datetime import date
 import streamlit as st
-import sqlite3
-import pandas as pd
 import plotly.express as px
-from analysis import personal_finance, calculate_debts
+from analysis import personal_finance, spending_by_category, calculate_debts
+from db import get_version
+from groups import user_groups
+from instrumentation import timer
+from recurring import upcoming_charges
+
+def data_version(user_id):
+    """Return the data versions of a user's dashboard: full rebuilds and the user's own writes."""
+    return tuple(get_version(key) for key in ("expenses", f"expenses:{user_id}", "recurring", f"recurring:{user_id}"))
+
+@st.cache_data(max_entries=256)
+def load_spending(user_id, data_version, today):
+    """Load the dashboard's spending data.
+
+    `data_version` (see data_version()) invalidates the cache when the
+    user's expenses or recurring series are written, or after a full
+    rebuild, and `today` when the date moves the upcoming charges.
+    """
+    monthly, predicted_budget = personal_finance(user_id)
+    return monthly, predicted_budget, spending_by_category(user_id), upcoming_charges(user_id)
 
 def dashboard(user_id):
     """Display the user's financial dashboard."""
     st.title("XpenseAI Dashboard")
-    monthly, predicted_budget = personal_finance(user_id)
+    with timer("section", "dashboard: load spending"):
+        monthly, predicted_budget, df, upcoming = load_spending(user_id, data_version(user_id), date.today())
+
+    with timer("section", "dashboard: charts"):
+        # Pie Chart: Spending by Category
+        fig = px.pie(df, values="total", names="category", title="Spending Distribution")
+        st.plotly_chart(fig)
 
-    # Pie Chart: Spending by Category
-    conn = sqlite3.connect("xpenseai.db")
-    df = pd.read_sql_query("SELECT category, SUM(amount) as total FROM expenses WHERE payer_id = ? GROUP BY category",
-                           conn, params=(user_id,))
-    conn.close()
-    fig = px.pie(df, values="total", names="category", title="Spending Distribution")
-    st.plotly_chart(fig)
+        # Line Chart: Budget vs. Actual
+        fig = px.line(monthly, y="amount", title=f"Monthly Spending (Predicted Next: ${predicted_budget:.2f})")
+        st.plotly_chart(fig)
 
-    # Line Chart: Budget vs. Actual
-    fig = px.line(monthly, y="amount", title=f"Monthly Spending (Predicted Next: ${predicted_budget:.2f})")
-    st.plotly_chart(fig)
+    # Upcoming recurring charges
+    if not upcoming.empty:
+        st.subheader("Upcoming Charges")
+        st.write(f"${upcoming['amount'].sum():.2f} in recurring charges expected over the next 30 days.")
+        st.dataframe(upcoming, hide_index=True)
 
     # Group Debts
-    simplified_debts = calculate_debts()
-    if simplified_debts:
-        st.subheader("Debt Settlements")
-        for from_id, to_id, amount in simplified_debts:
-            st.write(f"User {from_id} owes User {to_id} {amount:.2f}")
+    with timer("section", "dashboard: settle debts"):
+        settlements = [(name, calculate_debts(group_id)) for group_id, name in user_groups(user_id)]
+    for name, simplified_debts in settlements:
+        if simplified_debts:
+            st.subheader(f"Debt Settlements: {name}")
+            for from_id, to_id, amount in simplified_debts:
+                st.write(f"User {from_id} owes User {to_id} {amount:.2f}")
 
     # Alerts
     if not monthly.empty and monthly["amount"].iloc[-1] > predicted_budget * 1.2:
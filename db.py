@@ -0,0 +1,86 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from instrumentation import ENABLED as INSTRUMENTED, InstrumentedConnection
+
+DB_PATH = os.environ.get("XPENSEAI_DB", "xpenseai.db")
+
+# Applied once to every new connection. WAL lets readers run alongside a
+# writer, and busy_timeout makes writers wait for the lock instead of failing
+# with "database is locked".
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 134217728",
+    "PRAGMA temp_store = MEMORY",
+)
+
+_local = threading.local()
+
+def set_db_path(path):
+    """Point the data-access layer at a different database file."""
+    global DB_PATH
+    close_connection()
+    DB_PATH = path
+
+def get_connection():
+    """Return this thread's cached connection, opening it on first use.
+
+    Connections run in autocommit mode; writes go through `transaction()`.
+    The sqlite3 statement cache keeps every distinct SQL string prepared for
+    the lifetime of the connection, so repeated queries are not re-parsed.
+    Unless instrumentation is disabled, every statement is timed (see
+    instrumentation.py).
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.path != DB_PATH:
+        close_connection()
+        factory = InstrumentedConnection if INSTRUMENTED else sqlite3.Connection
+        # The lock wait is set by the busy_timeout pragma alone.
+        conn = sqlite3.connect(DB_PATH, isolation_level=None, cached_statements=256, factory=factory)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        _local.conn, _local.path = conn, DB_PATH
+    return conn
+
+def close_connection():
+    """Close this thread's cached connection, if any."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+@contextmanager
+def transaction():
+    """Run a block inside one write transaction and yield a cursor.
+
+    The transaction is started with BEGIN IMMEDIATE so the write lock is
+    taken up front, committed when the block exits and rolled back if it
+    raises. Nested calls join the outer transaction.
+    """
+    conn = get_connection()
+    if conn.in_transaction:
+        yield conn.cursor()
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn.cursor()
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+def get_version(key):
+    """Return the current value of a version counter (0 if never bumped)."""
+    row = get_connection().execute("SELECT value FROM app_state WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else 0
+
+def bump_version(c, key):
+    """Increment a version counter inside the caller's transaction."""
+    c.execute("""
+        INSERT INTO app_state (key, value) VALUES (?, 1)
+        ON CONFLICT(key) DO UPDATE SET value = value + 1
+    """, (key,))
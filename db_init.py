@@ -1,9 +1,19 @@
-import sqlite3
+from db import get_connection, transaction
 
 def init_db():
-    """Initialize the SQLite database with required tables."""
-    conn = sqlite3.connect("xpenseai.db")
-    c = conn.cursor()
+    """Initialize the SQLite database and apply any pending migrations.
+
+    The schema version is kept in `PRAGMA user_version`. Each entry in
+    MIGRATIONS runs once, in order, inside its own transaction.
+    """
+    version = get_connection().execute("PRAGMA user_version").fetchone()[0]
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        with transaction() as c:
+            migration(c)
+            c.execute(f"PRAGMA user_version = {number}")
+
+def _migration_1_initial_schema(c):
+    """Create the original tables (no-op on databases that already have them)."""
 
     # Create users table
     c.execute("""
@@ -64,8 +74,365 @@ def init_db():
     # Insert default categories if not already present
     c.execute("INSERT OR IGNORE INTO categories (name) VALUES ('Food'), ('Transportation'), ('Entertainment')")
 
-    conn.commit()
-    conn.close()
+# Month key derived from an ISO date; NULL when the date could not be normalized.
+MONTH_EXPR = "CASE WHEN date GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]' THEN substr(date, 1, 7) END"
+
+def _rebuild_table(c, name, create_sql, copy_sql):
+    """Recreate a table with a new definition, keeping its rows and AUTOINCREMENT counter."""
+    c.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (name,))
+    seq = c.fetchone()
+    c.execute(create_sql)
+    c.execute(copy_sql)
+    c.execute(f"DROP TABLE {name}")
+    c.execute(f"ALTER TABLE {name}_new RENAME TO {name}")
+    if seq:
+        c.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (seq[0], name))
+
+def _normalize_dates(c, table):
+    """Rewrite every distinct date in `table` to ISO form where it can be parsed."""
+    from ledger import normalize_date
+    c.execute(f"SELECT DISTINCT date FROM {table} WHERE date IS NOT NULL")
+    updates = [(normalize_date(date), date) for (date,) in c.fetchall()]
+    c.executemany(f"UPDATE {table} SET date = ? WHERE date = ?",
+                  [(new, old) for new, old in updates if new != old])
+
+def _migration_2_cents_months_indexes(c):
+    """Store amounts as integer cents, add a month key and per-user indexes.
+
+    The old REAL columns stay readable as generated columns, so queries that
+    select `amount` or `share_amount` keep working.
+    """
+    _rebuild_table(c, "expenses", f"""
+        CREATE TABLE expenses_new (
+            expense_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            payer_id INTEGER,
+            amount_cents INTEGER NOT NULL,
+            amount REAL GENERATED ALWAYS AS (amount_cents / 100.0) VIRTUAL,
+            merchant TEXT,
+            date TEXT,
+            month TEXT GENERATED ALWAYS AS ({MONTH_EXPR}) VIRTUAL,
+            category TEXT,
+            FOREIGN KEY (payer_id) REFERENCES users(user_id)
+        )
+    """, """
+        INSERT INTO expenses_new (expense_id, payer_id, amount_cents, merchant, date, category)
+        SELECT expense_id, payer_id, CAST(ROUND(amount * 100) AS INTEGER), merchant, date, category
+        FROM expenses
+    """)
+
+    _rebuild_table(c, "expense_splits", """
+        CREATE TABLE expense_splits_new (
+            expense_id INTEGER,
+            user_id INTEGER,
+            share_cents INTEGER NOT NULL,
+            share_amount REAL GENERATED ALWAYS AS (share_cents / 100.0) VIRTUAL,
+            PRIMARY KEY (expense_id, user_id),
+            FOREIGN KEY (expense_id) REFERENCES expenses(expense_id),
+            FOREIGN KEY (user_id) REFERENCES users(user_id)
+        )
+    """, """
+        INSERT INTO expense_splits_new (expense_id, user_id, share_cents)
+        SELECT expense_id, user_id, CAST(ROUND(share_amount * 100) AS INTEGER)
+        FROM expense_splits
+    """)
+
+    _rebuild_table(c, "payments", f"""
+        CREATE TABLE payments_new (
+            payment_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            from_user_id INTEGER,
+            to_user_id INTEGER,
+            amount_cents INTEGER NOT NULL,
+            amount REAL GENERATED ALWAYS AS (amount_cents / 100.0) VIRTUAL,
+            date TEXT,
+            FOREIGN KEY (from_user_id) REFERENCES users(user_id),
+            FOREIGN KEY (to_user_id) REFERENCES users(user_id)
+        )
+    """, """
+        INSERT INTO payments_new (payment_id, from_user_id, to_user_id, amount_cents, date)
+        SELECT payment_id, from_user_id, to_user_id, CAST(ROUND(amount * 100) AS INTEGER), date
+        FROM payments
+    """)
+
+    _normalize_dates(c, "expenses")
+    _normalize_dates(c, "payments")
+
+    # (payer_id, month) also serves plain payer_id lookups, so no separate index is needed.
+    c.execute("CREATE INDEX IF NOT EXISTS idx_expenses_payer_month ON expenses (payer_id, month)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_expense_splits_user ON expense_splits (user_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_payments_from_user ON payments (from_user_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_payments_to_user ON payments (to_user_id)")
+
+    # Net balance per user in cents, maintained on every write (see ledger.py)
+    c.execute("DROP TABLE IF EXISTS balances")
+    c.execute("""
+        CREATE TABLE balances (
+            user_id INTEGER PRIMARY KEY,
+            balance_cents INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users(user_id)
+        )
+    """)
+    c.execute("""
+        INSERT INTO balances (user_id, balance_cents)
+        SELECT user_id, SUM(delta) FROM (
+            SELECT e.payer_id AS user_id, s.share_cents AS delta
+            FROM expense_splits s JOIN expenses e ON e.expense_id = s.expense_id
+            WHERE s.user_id != e.payer_id
+            UNION ALL
+            SELECT s.user_id, -s.share_cents
+            FROM expense_splits s JOIN expenses e ON e.expense_id = s.expense_id
+            WHERE s.user_id != e.payer_id
+            UNION ALL
+            SELECT from_user_id, amount_cents FROM payments WHERE from_user_id != to_user_id
+            UNION ALL
+            SELECT to_user_id, -amount_cents FROM payments WHERE from_user_id != to_user_id
+        )
+        GROUP BY user_id
+        HAVING SUM(delta) != 0
+    """)
+
+def _migration_3_import_hash(c):
+    """Add a content hash column used to skip rows that were already imported."""
+    c.execute("ALTER TABLE expenses ADD COLUMN import_hash TEXT")
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_expenses_import_hash "
+              "ON expenses (import_hash) WHERE import_hash IS NOT NULL")
+
+def _migration_4_ocr_cache(c):
+    """Add a cache of OCR text keyed by image content hash."""
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS ocr_cache (
+            image_hash TEXT PRIMARY KEY,
+            text TEXT NOT NULL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+def _migration_5_savings_predictions(c):
+    """Add stored monthly savings predictions and a month index for the batch job."""
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS savings_predictions (
+            user_id INTEGER,
+            month TEXT,
+            Potential_Savings_Groceries REAL,
+            Potential_Savings_Transport REAL,
+            Potential_Savings_Eating_Out REAL,
+            Potential_Savings_Entertainment REAL,
+            Potential_Savings_Utilities REAL,
+            Potential_Savings_Healthcare REAL,
+            Potential_Savings_Education REAL,
+            Potential_Savings_Miscellaneous REAL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, month),
+            FOREIGN KEY (user_id) REFERENCES users(user_id)
+        )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_expenses_month ON expenses (month)")
+
+def _migration_6_category_rules(c):
+    """Move the hard-coded categorization keywords into a rules table."""
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS app_state (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS category_rules (
+            rule_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            keyword TEXT NOT NULL,
+            category TEXT NOT NULL,
+            priority INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(user_id)
+        )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_category_rules_user ON category_rules (user_id)")
+    # Global rules, in the order the original if/elif chain checked them.
+    c.executemany("INSERT INTO category_rules (keyword, category) VALUES (?, ?)", [
+        ("restaurant", "Food"), ("cafe", "Food"),
+        ("gas", "Transportation"), ("fuel", "Transportation"),
+        ("movie", "Entertainment"), ("cinema", "Entertainment"),
+    ])
+    c.execute("INSERT OR IGNORE INTO categories (name) VALUES ('Uncategorized')")
+
+def _migration_7_spending_rollups(c):
+    """Add per (user, month, category) spending totals and backfill them."""
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS spending_rollups (
+            user_id INTEGER NOT NULL,
+            month TEXT NOT NULL,
+            category TEXT NOT NULL,
+            total_cents INTEGER NOT NULL DEFAULT 0,
+            expense_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, month, category)
+        ) WITHOUT ROWID
+    """)
+    c.execute("""
+        INSERT OR REPLACE INTO spending_rollups (user_id, month, category, total_cents, expense_count)
+        SELECT payer_id, COALESCE(month, ''), COALESCE(category, 'Uncategorized'),
+               SUM(amount_cents), COUNT(*)
+        FROM expenses
+        GROUP BY payer_id, COALESCE(month, ''), COALESCE(category, 'Uncategorized')
+    """)
+
+def _migration_8_admin_users(c):
+    """Add the admin flag that gates the metrics page."""
+    columns = [row[1] for row in c.execute("PRAGMA table_info(users)")]
+    if "is_admin" not in columns:
+        c.execute("ALTER TABLE users ADD COLUMN is_admin INTEGER NOT NULL DEFAULT 0")
+
+def _migration_9_contacts(c):
+    """Add the contacts table and a case-insensitive username index for user search."""
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS contacts (
+            user_id INTEGER NOT NULL,
+            contact_id INTEGER NOT NULL,
+            PRIMARY KEY (user_id, contact_id)
+        ) WITHOUT ROWID
+    """)
+    c.execute("""
+        INSERT OR IGNORE INTO contacts (user_id, contact_id)
+        SELECT e.payer_id, s.user_id FROM expense_splits s JOIN expenses e USING (expense_id)
+        WHERE s.user_id != e.payer_id
+        UNION SELECT s.user_id, e.payer_id FROM expense_splits s JOIN expenses e USING (expense_id)
+        WHERE s.user_id != e.payer_id
+        UNION SELECT from_user_id, to_user_id FROM payments WHERE from_user_id != to_user_id
+        UNION SELECT to_user_id, from_user_id FROM payments WHERE from_user_id != to_user_id
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_users_username_nocase ON users (username COLLATE NOCASE)")
+
+def _migration_10_groups(c):
+    """Add groups and scope expenses, payments and balances to a group.
+
+    Expenses shared with other users and payments between users recorded
+    before groups existed are moved into a "General" group whose members
+    are everyone involved in them. Personal expenses keep a NULL group.
+    """
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS groups (
+            group_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            created_by INTEGER,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (created_by) REFERENCES users(user_id)
+        )
+    """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS group_members (
+            group_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            joined_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (group_id, user_id),
+            FOREIGN KEY (group_id) REFERENCES groups(group_id),
+            FOREIGN KEY (user_id) REFERENCES users(user_id)
+        ) WITHOUT ROWID
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_group_members_user ON group_members (user_id, group_id)")
+    for table in ("expenses", "payments"):
+        columns = [row[1] for row in c.execute(f"PRAGMA table_info({table})")]
+        if "group_id" not in columns:
+            c.execute(f"ALTER TABLE {table} ADD COLUMN group_id INTEGER REFERENCES groups(group_id)")
+        c.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_group ON {table} (group_id)")
+
+    c.execute("""
+        CREATE TEMP TABLE shared_users AS
+        SELECT s.user_id FROM expense_splits s JOIN expenses e USING (expense_id) WHERE s.user_id != e.payer_id
+        UNION SELECT e.payer_id FROM expense_splits s JOIN expenses e USING (expense_id) WHERE s.user_id != e.payer_id
+        UNION SELECT from_user_id FROM payments WHERE from_user_id != to_user_id
+        UNION SELECT to_user_id FROM payments WHERE from_user_id != to_user_id
+    """)
+    general_id = None
+    if c.execute("SELECT 1 FROM shared_users LIMIT 1").fetchone():
+        c.execute("INSERT INTO groups (name) VALUES ('General')")
+        general_id = c.lastrowid
+        c.execute("INSERT INTO group_members (group_id, user_id) SELECT ?, user_id FROM shared_users", (general_id,))
+        c.execute("""
+            UPDATE expenses SET group_id = ? WHERE group_id IS NULL AND expense_id IN (
+                SELECT s.expense_id FROM expense_splits s JOIN expenses e USING (expense_id)
+                WHERE s.user_id != e.payer_id)
+        """, (general_id,))
+        c.execute("UPDATE payments SET group_id = ? WHERE group_id IS NULL AND from_user_id != to_user_id",
+                  (general_id,))
+    c.execute("DROP TABLE shared_users")
+
+    c.execute("ALTER TABLE balances RENAME TO balances_by_user")
+    c.execute("""
+        CREATE TABLE balances (
+            group_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            balance_cents INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (group_id, user_id),
+            FOREIGN KEY (group_id) REFERENCES groups(group_id),
+            FOREIGN KEY (user_id) REFERENCES users(user_id)
+        ) WITHOUT ROWID
+    """)
+    if general_id is not None:
+        c.execute("INSERT INTO balances (group_id, user_id, balance_cents) "
+                  "SELECT ?, user_id, balance_cents FROM balances_by_user WHERE balance_cents != 0", (general_id,))
+    c.execute("DROP TABLE balances_by_user")
+
+def _migration_11_archive(c):
+    """Track archived Parquet parts and the import hashes of archived expenses."""
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS archive_parts (
+            part_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            month TEXT NOT NULL,
+            expenses_path TEXT NOT NULL,
+            splits_path TEXT NOT NULL,
+            expense_count INTEGER NOT NULL,
+            split_count INTEGER NOT NULL,
+            archived_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_archive_parts_month ON archive_parts (month)")
+    # Re-importing a CSV must still skip rows that have since been archived.
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS archived_import_hashes (
+            import_hash TEXT PRIMARY KEY
+        ) WITHOUT ROWID
+    """)
+
+def _migration_12_recurring_series(c):
+    """Store recurring charges detected by recurring.py, one row per user and merchant."""
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS recurring_series (
+            user_id INTEGER NOT NULL,
+            merchant_key INTEGER NOT NULL,
+            merchant TEXT NOT NULL,
+            category TEXT,
+            period TEXT NOT NULL,
+            amount_cents INTEGER NOT NULL,
+            charges INTEGER NOT NULL,
+            first_date TEXT NOT NULL,
+            last_date TEXT NOT NULL,
+            next_date TEXT NOT NULL,
+            PRIMARY KEY (user_id, merchant_key),
+            FOREIGN KEY (user_id) REFERENCES users(user_id)
+        ) WITHOUT ROWID
+    """)
+
+def _migration_13_group_category_rules(c):
+    """Let a category rule belong to a group; rules with neither a user nor a group stay global."""
+    columns = [row[1] for row in c.execute("PRAGMA table_info(category_rules)")]
+    if "group_id" not in columns:
+        c.execute("ALTER TABLE category_rules ADD COLUMN group_id INTEGER REFERENCES groups(group_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_category_rules_group ON category_rules (group_id)")
+
+MIGRATIONS = [
+    _migration_1_initial_schema,
+    _migration_2_cents_months_indexes,
+    _migration_3_import_hash,
+    _migration_4_ocr_cache,
+    _migration_5_savings_predictions,
+    _migration_6_category_rules,
+    _migration_7_spending_rollups,
+    _migration_8_admin_users,
+    _migration_9_contacts,
+    _migration_10_groups,
+    _migration_11_archive,
+    _migration_12_recurring_series,
+    _migration_13_group_category_rules,
+]
 
 if __name__ == "__main__":
-    init_db()
\ No newline at end of file
+    init_db()
@@ -1,105 +1,113 @@
 import streamlit as st
-import sqlite3
-from PIL import Image
 import pytesseract
-import spacy
-import pandas as pd
 import subprocess
-
-nlp = spacy.blank("en")
-
-def categorize_expense(merchant):
-    """Categorize an expense based on merchant name."""
-    merchant = merchant.lower()
-    if "restaurant" in merchant or "cafe" in merchant:
-        return "Food"
-    elif "gas" in merchant or "fuel" in merchant:
-        return "Transportation"
-    elif "movie" in merchant or "cinema" in merchant:
-        return "Entertainment"
-    return "Uncategorized"
+from categorizer import add_rule, categorize_expense, delete_rule, list_categories, list_rules
+from csv_import import import_csv
+from groups import group_select
+from ledger import add_expense, equal_shares
+from ocr_worker import ocr_receipts, preprocess_image
+from receipt_parser import parse_receipt
+from user_lookup import clear_cache, user_multiselect
+from write_queue import run
 
 def extract_expense_from_image(image):
     """Extract expense details from an image using OCR."""
-    text = pytesseract.image_to_string(image)
-    doc = nlp(text)
-    amount, merchant, date = None, None, None
-    for ent in doc.ents:
-        if ent.label_ == "MONEY" and not amount:
-            amount = float(ent.text.replace("$", "").replace(",", ""))
-        elif ent.label_ == "ORG" and not merchant:
-            merchant = ent.text
-        elif ent.label_ == "DATE" and not date:
-            date = ent.text
-    return amount, merchant, date
+    return extract_expense_from_text(pytesseract.image_to_string(preprocess_image(image)))
+
+def extract_expense_from_text(text):
+    """Extract expense details from OCR text."""
+    return parse_receipt(text)
+
+def category_select(suggested_category, key=None):
+    """Show the category picker with the rule-based suggestion preselected."""
+    categories = list_categories()
+    if suggested_category not in categories:
+        categories.insert(-1, suggested_category)
+    return st.selectbox("Category", categories, index=categories.index(suggested_category), key=key)
+
+def receipt_form(user_id, name, key, amount, merchant, date):
+    """Show the confirmation form for one OCR'd receipt."""
+    suggested_category = categorize_expense(merchant or "", user_id)
+    with st.form(f"ocr_form_{key}"):
+        st.caption(name)
+        amount = st.number_input("Amount", value=amount or 0.0, key=f"ocr_amount_{key}")
+        merchant = st.text_input("Merchant", value=merchant or "", key=f"ocr_merchant_{key}")
+        date = st.text_input("Date", value=date or "", key=f"ocr_date_{key}")
+        category = category_select(suggested_category, key=f"ocr_category_{key}")
+        if st.form_submit_button("Save"):
+            run(add_expense, user_id, amount, merchant, date, category, [(user_id, amount)])
+            st.success("Expense added!")
 
 def ocr_input(user_id):
-    """Add expense via receipt image upload."""
+    """Add expenses via one or more receipt image uploads."""
     st.subheader("Add Expense via Receipt")
-    uploaded_file = st.file_uploader("Upload Receipt", type=["png", "jpg"], key="ocr_upload")
-    if uploaded_file:
-        image = Image.open(uploaded_file)
-        amount, merchant, date = extract_expense_from_image(image)
-        suggested_category = categorize_expense(merchant or "")
-        with st.form("ocr_form"):
-            amount = st.number_input("Amount", value=amount or 0.0)
-            merchant = st.text_input("Merchant", value=merchant or "")
-            date = st.text_input("Date", value=date or "")
-            category = st.selectbox("Category", ["Food", "Transportation", "Entertainment", "Uncategorized"],
-                                    index=["Food", "Transportation", "Entertainment", "Uncategorized"].index(suggested_category))
-            if st.form_submit_button("Save"):
-                conn = sqlite3.connect("xpenseai.db")
-                c = conn.cursor()
-                c.execute("INSERT INTO expenses (payer_id, amount, merchant, date, category) VALUES (?, ?, ?, ?, ?)",
-                          (user_id, amount, merchant, date, category))
-                expense_id = c.lastrowid
-                c.execute("INSERT INTO expense_splits (expense_id, user_id, share_amount) VALUES (?, ?, ?)",
-                          (expense_id, user_id, amount))
-                conn.commit()
-                conn.close()
-                st.success("Expense added!")
+    uploaded_files = st.file_uploader("Upload Receipts", type=["png", "jpg"], key="ocr_upload",
+                                      accept_multiple_files=True)
+    if uploaded_files:
+        # Receipts are OCR'd in a background process pool; each form appears
+        # as soon as its receipt is done, and repeats come from the cache.
+        uploads = [(f.name, f.getvalue()) for f in uploaded_files]
+        with st.spinner(f"Reading {len(uploads)} receipt(s)..."):
+            for name, digest, text, error in ocr_receipts(uploads):
+                if error is not None:
+                    st.warning(f"Could not read {name}: {error}")
+                    continue
+                amount, merchant, date = extract_expense_from_text(text)
+                receipt_form(user_id, name, digest[:16], amount, merchant, date)
 
-def text_input(user_id, get_users_func):
+def text_input(user_id):
     """Add expense manually with split options."""
     st.subheader("Add Expense Manually")
+    group_id = group_select(user_id, "expense_group", personal=True)
+    split_users = user_multiselect(user_id, "split_users", "Split With", group_id) if group_id is not None else [user_id]
     with st.form("text_form"):
         amount = st.number_input("Amount", min_value=0.0)
         merchant = st.text_input("Merchant")
         date = st.date_input("Date")
-        split_users = st.multiselect("Split With", get_users_func(), default=[user_id])
         equal_split = st.checkbox("Split Equally", value=True)
-        suggested_category = categorize_expense(merchant or "")
-        category = st.selectbox("Category", ["Food", "Transportation", "Entertainment", "Uncategorized"],
-                                index=["Food", "Transportation", "Entertainment", "Uncategorized"].index(suggested_category))
+        suggested_category = categorize_expense(merchant or "", user_id, group_id)
+        category = category_select(suggested_category)
         if st.form_submit_button("Save"):
-            conn = sqlite3.connect("xpenseai.db")
-            c = conn.cursor()
-            c.execute("INSERT INTO expenses (payer_id, amount, merchant, date, category) VALUES (?, ?, ?, ?, ?)",
-                      (user_id, amount, merchant, str(date), category))
-            expense_id = c.lastrowid
-            share = amount / len(split_users) if equal_split else amount  # Unequal split logic TBD
-            for uid in split_users:
-                c.execute("INSERT INTO expense_splits (expense_id, user_id, share_amount) VALUES (?, ?, ?)",
-                          (expense_id, uid, share))
-            conn.commit()
-            conn.close()
+            if equal_split:
+                shares = equal_shares(amount, split_users)
+            else:
+                shares = [(uid, amount) for uid in split_users]  # Unequal split logic TBD
+            run(add_expense, user_id, amount, merchant, str(date), category, shares, group_id)
+            clear_cache()  # new contacts show up in the picker straight away
             st.success("Expense added!")
 
+def category_rules(user_id):
+    """Let a user add and remove their own merchant keyword rules and those of their groups."""
+    with st.expander("Category Rules"):
+        st.caption("Merchants containing a keyword get its category. Your rules take precedence over "
+                   "a group's rules, which take precedence over the defaults.")
+        group_id = group_select(user_id, "rule_group", personal=True)
+        owner = {"user_id": user_id} if group_id is None else {"group_id": group_id}
+        rules = list_rules(**owner)
+        if not rules.empty:
+            st.dataframe(rules, hide_index=True)
+        with st.form("rule_form"):
+            keyword = st.text_input("Keyword")
+            category = st.text_input("Category")
+            if st.form_submit_button("Add Rule") and keyword.strip() and category.strip():
+                run(add_rule, keyword, category.strip(), **owner)
+                st.success(f"Merchants containing '{keyword.strip().lower()}' will be categorized as {category.strip()}.")
+        if not rules.empty:
+            rule_id = st.selectbox("Remove rule", rules["rule_id"],
+                                   format_func=lambda r: " -> ".join(rules.loc[rules["rule_id"] == r, ["keyword", "category"]].iloc[0]))
+            if st.button("Remove Rule"):
+                run(delete_rule, int(rule_id), **owner)
+                st.rerun()
+
 def csv_input(user_id):
     """Upload expenses via CSV."""
     st.subheader("Upload Expenses via CSV")
     uploaded_file = st.file_uploader("Upload CSV", type="csv", key="csv_upload")
-    if uploaded_file:
-        df = pd.read_csv(uploaded_file, names=["date", "merchant", "amount", "category"])
-        conn = sqlite3.connect("xpenseai.db")
-        c = conn.cursor()
-        for _, row in df.iterrows():
-            category = categorize_expense(row["merchant"]) if pd.isna(row["category"]) else row["category"]
-            c.execute("INSERT INTO expenses (payer_id, amount, merchant, date, category) VALUES (?, ?, ?, ?, ?)",
-                      (user_id, row["amount"], row["merchant"], row["date"], category))
-            expense_id = c.lastrowid
-            c.execute("INSERT INTO expense_splits (expense_id, user_id, share_amount) VALUES (?, ?, ?)",
-                      (expense_id, user_id, row["amount"]))
-        conn.commit()
-        conn.close()
-        st.success("Expenses imported!")
+    if uploaded_file and st.session_state.get("csv_imported") != uploaded_file.file_id:
+        status = st.empty()
+        stats = import_csv(uploaded_file, user_id, progress=lambda s: status.write(
+            f"Imported {s['rows']} rows ({s['rows_per_second']:.0f} rows/s)..."))
+        st.session_state["csv_imported"] = uploaded_file.file_id
+        status.empty()
+        st.success(f"Expenses imported! {stats['inserted']} added, {stats['skipped']} already imported, "
+                   f"{stats['invalid']} invalid rows skipped.")
@@ -0,0 +1,50 @@
+import streamlit as st
+from db import get_connection
+
+def create_group(c, name, creator_id, member_ids=()):
+    """Create a group with its creator and `member_ids` as members; return the group_id.
+
+    The caller owns the transaction, as with ledger.add_expense.
+    """
+    c.execute("INSERT INTO groups (name, created_by) VALUES (?, ?)", (name, creator_id))
+    group_id = c.lastrowid
+    c.executemany("INSERT OR IGNORE INTO group_members (group_id, user_id) VALUES (?, ?)",
+                  [(group_id, user_id) for user_id in {creator_id, *member_ids}])
+    return group_id
+
+def add_member(c, group_id, user_id):
+    """Add a user to a group inside the caller's transaction (no-op if they are already a member)."""
+    c.execute("INSERT OR IGNORE INTO group_members (group_id, user_id) VALUES (?, ?)", (group_id, user_id))
+
+def is_member(group_id, user_id):
+    """Return whether a user belongs to a group."""
+    return get_connection().execute("SELECT 1 FROM group_members WHERE group_id = ? AND user_id = ?",
+                                    (group_id, user_id)).fetchone() is not None
+
+def user_groups(user_id):
+    """Return the (group_id, name) pairs of every group a user belongs to, ordered by name."""
+    return get_connection().execute("""
+        SELECT g.group_id, g.name
+        FROM group_members m JOIN groups g ON g.group_id = m.group_id
+        WHERE m.user_id = ?
+        ORDER BY g.name, g.group_id
+    """, (user_id,)).fetchall()
+
+def group_members(group_id):
+    """Return the (user_id, username) pairs of a group's members, ordered by username."""
+    return get_connection().execute("""
+        SELECT u.user_id, u.username
+        FROM group_members m JOIN users u ON u.user_id = m.user_id
+        WHERE m.group_id = ?
+        ORDER BY u.username COLLATE NOCASE
+    """, (group_id,)).fetchall()
+
+def group_select(user_id, key, personal=False):
+    """Show a selectbox of the user's groups and return the chosen group_id.
+
+    With `personal`, a "Personal" entry (None) is offered first. Returns
+    None when nothing can be chosen.
+    """
+    groups = dict(user_groups(user_id))
+    options = [None, *groups] if personal else list(groups)
+    return st.selectbox("Group", options, format_func=lambda group_id: groups.get(group_id, "Personal"), key=key)
@@ -0,0 +1,228 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# Instrumentation is on by default; set XPENSEAI_INSTRUMENTATION=0 to turn it off.
+ENABLED = os.environ.get("XPENSEAI_INSTRUMENTATION", "1") != "0"
+SLOW_QUERY_MS = float(os.environ.get("XPENSEAI_SLOW_QUERY_MS", "100"))
+SLOW_QUERY_LOG = os.environ.get("XPENSEAI_SLOW_QUERY_LOG", "slow_queries.log")
+
+# Histogram bucket upper bounds in milliseconds; the last bucket is unbounded.
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float("inf"))
+
+ITER_BATCH = 256
+PLAN_STATEMENTS = ("select", "with", "insert", "update", "delete", "replace")
+PLACEHOLDER_LIST_RE = re.compile(r"\?(?:\s*,\s*\?)+")
+
+_lock = threading.Lock()
+_metrics = {}
+_slow_queries = deque(maxlen=100)
+_statement_names = {}
+_started_at = datetime.now(timezone.utc)
+
+def record(kind, name, seconds, rows=0):
+    """Add one timed call to the `kind`/`name` histogram."""
+    ms = seconds * 1000
+    bucket = bisect_left(BUCKETS_MS, ms)
+    with _lock:
+        entry = _metrics.get((kind, name))
+        if entry is None:
+            entry = _metrics[(kind, name)] = {"calls": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0,
+                                              "buckets": [0] * len(BUCKETS_MS)}
+        entry["calls"] += 1
+        entry["total_ms"] += ms
+        entry["rows"] += rows
+        entry["buckets"][bucket] += 1
+        if ms > entry["max_ms"]:
+            entry["max_ms"] = ms
+
+@contextmanager
+def timer(kind, name):
+    """Time the enclosed block and record it under `kind`/`name`."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(kind, name, time.perf_counter() - started)
+
+def _percentile(buckets, calls, max_ms, q):
+    """Estimate a percentile as the upper bound of the bucket that contains it."""
+    target, seen = q * calls, 0
+    for bound, count in zip(BUCKETS_MS, buckets):
+        seen += count
+        if seen >= target:
+            return round(min(bound, max_ms), 3)
+    return round(max_ms, 3)
+
+def snapshot():
+    """Return every recorded metric as a list of dicts, slowest total first."""
+    with _lock:
+        items = [(kind, name, dict(entry, buckets=list(entry["buckets"])))
+                 for (kind, name), entry in _metrics.items()]
+    rows = []
+    for kind, name, entry in items:
+        calls = entry["calls"]
+        rows.append({
+            "kind": kind, "name": name, "calls": calls, "rows": entry["rows"],
+            "total_ms": round(entry["total_ms"], 3), "mean_ms": round(entry["total_ms"] / calls, 3),
+            "p50_ms": _percentile(entry["buckets"], calls, entry["max_ms"], 0.5),
+            "p95_ms": _percentile(entry["buckets"], calls, entry["max_ms"], 0.95),
+            "max_ms": round(entry["max_ms"], 3), "buckets": entry["buckets"],
+        })
+    return sorted(rows, key=lambda row: row["total_ms"], reverse=True)
+
+def slow_queries():
+    """Return the most recent slow queries, newest first."""
+    with _lock:
+        return list(reversed(_slow_queries))
+
+def started_at():
+    """Return when this process started collecting metrics."""
+    return _started_at
+
+def reset():
+    """Clear all recorded metrics and the in-memory slow-query list."""
+    global _started_at
+    with _lock:
+        _metrics.clear()
+        _slow_queries.clear()
+        _started_at = datetime.now(timezone.utc)
+
+def statement_name(sql):
+    """Normalize SQL text into a metric name.
+
+    Whitespace is collapsed and variable-length placeholder lists such as
+    IN (?, ?, ?) become IN (?...), so one statement maps to one histogram.
+    """
+    name = _statement_names.get(sql)
+    if name is None:
+        name = PLACEHOLDER_LIST_RE.sub("?...", " ".join(sql.split()))
+        if len(_statement_names) < 2000:
+            _statement_names[sql] = name
+    return name
+
+def explain(conn, sql, parameters):
+    """Return the EXPLAIN QUERY PLAN lines for a statement, or None."""
+    if not sql.lstrip().lower().startswith(PLAN_STATEMENTS):
+        return None
+    try:
+        # A plain cursor, so the EXPLAIN itself is not instrumented.
+        plan = sqlite3.Cursor(conn).execute("EXPLAIN QUERY PLAN " + sql, parameters).fetchall()
+    except sqlite3.Error:
+        return None
+    depth, lines = {0: -1}, []
+    for node_id, parent, _, detail in plan:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node_id] + detail)
+    return lines
+
+def _log_slow_query(conn, name, sql, parameters, ms, rows):
+    """Keep a slow statement with its plan and append it to the slow-query log.
+
+    Parameters are used for the plan but never logged, since they can hold
+    passwords or personal data.
+    """
+    plan = explain(conn, sql, parameters) if parameters is not None else None
+    entry = {"at": datetime.now(timezone.utc).isoformat(timespec="seconds"), "ms": round(ms, 3),
+             "rows": rows, "sql": name, "plan": plan}
+    with _lock:
+        _slow_queries.append(entry)
+        if SLOW_QUERY_LOG:
+            with open(SLOW_QUERY_LOG, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that records the latency and row count of every statement.
+
+    SQLite produces rows lazily, so a query is timed from execute() until
+    its rows are fetched. The measurement is recorded when the cursor runs
+    its next statement, is closed, or is garbage collected.
+    """
+    _sql = None
+
+    def _begin(self, sql, parameters):
+        self._finish()
+        self._sql, self._parameters, self._elapsed, self._rows = sql, parameters, 0.0, 0
+
+    def _finish(self):
+        if self._sql is None:
+            return
+        sql, self._sql = self._sql, None
+        rows = self._rows or max(self.rowcount, 0)
+        name = statement_name(sql)
+        record("sql", name, self._elapsed, rows)
+        if self._elapsed * 1000 >= SLOW_QUERY_MS:
+            _log_slow_query(self.connection, name, sql, self._parameters, self._elapsed * 1000, rows)
+
+    def execute(self, sql, parameters=()):
+        self._begin(sql, parameters)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._elapsed += time.perf_counter() - started
+
+    def executemany(self, sql, seq_of_parameters):
+        # The parameter sets are consumed by the call, so there is nothing to EXPLAIN with.
+        self._begin(sql, None)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._elapsed += time.perf_counter() - started
+            self._finish()
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._elapsed += time.perf_counter() - started
+        self._rows += row is not None
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._elapsed += time.perf_counter() - started
+        self._rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._elapsed += time.perf_counter() - started
+        self._rows += len(rows)
+        return rows
+
+    def __iter__(self):
+        # Rows are read in batches so iterating is not timed row by row.
+        while rows := self.fetchmany(ITER_BATCH):
+            yield from rows
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except sqlite3.Error:
+            pass
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose cursors, including those behind execute(), are instrumented."""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
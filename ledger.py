@@ -0,0 +1,271 @@
+import sys
+from datetime import date as date_type, datetime
+import pandas as pd
+from archive import read_archive
+from db import bump_version, get_connection, transaction
+from settlement import net_balances
+
+DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d", "%m/%d/%Y", "%m/%d/%y", "%d.%m.%Y",
+                "%d %b %Y", "%d %B %Y", "%b %d, %Y", "%B %d, %Y", "%b %d %Y", "%B %d %Y")
+
+# Per (user, month, category) spending totals. Undated expenses roll up
+# under month '' so the category totals still include them.
+ROLLUP_COLUMNS = """
+    payer_id, COALESCE(month, ''), COALESCE(category, 'Uncategorized'), SUM(amount_cents), COUNT(*)
+"""
+ROLLUP_GROUP_BY = "GROUP BY payer_id, COALESCE(month, ''), COALESCE(category, 'Uncategorized')"
+ROLLUP_UPSERT = """
+    ON CONFLICT(user_id, month, category) DO UPDATE SET
+        total_cents = total_cents + excluded.total_cents,
+        expense_count = expense_count + excluded.expense_count
+"""
+
+# Every pair of users who have shared an expense or a payment, both ways round.
+CONTACTS_SELECT = """
+    SELECT e.payer_id, s.user_id FROM expense_splits s JOIN expenses e USING (expense_id)
+    WHERE s.user_id != e.payer_id
+    UNION SELECT s.user_id, e.payer_id FROM expense_splits s JOIN expenses e USING (expense_id)
+    WHERE s.user_id != e.payer_id
+    UNION SELECT from_user_id, to_user_id FROM payments WHERE from_user_id != to_user_id
+    UNION SELECT to_user_id, from_user_id FROM payments WHERE from_user_id != to_user_id
+"""
+
+def normalize_date(value):
+    """Return `value` as an ISO YYYY-MM-DD string, or unchanged if it can't be parsed."""
+    if isinstance(value, (date_type, datetime)):
+        return value.strftime("%Y-%m-%d")
+    if not isinstance(value, str):
+        return value
+    text = value.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return text
+
+def to_cents(amount):
+    """Convert a currency amount to integer cents."""
+    return int(round(float(amount) * 100))
+
+def equal_shares(amount, user_ids):
+    """Split `amount` equally between users, spreading leftover cents so the shares add up."""
+    base, remainder = divmod(to_cents(amount), len(user_ids))
+    return [(user_id, (base + (1 if i < remainder else 0)) / 100)
+            for i, user_id in enumerate(user_ids)]
+
+def _apply_balance_deltas(c, group_id, deltas):
+    """Add per-user balance deltas (in cents) to a group's balances."""
+    c.executemany("""
+        INSERT INTO balances (group_id, user_id, balance_cents) VALUES (?, ?, ?)
+        ON CONFLICT(group_id, user_id) DO UPDATE SET balance_cents = balance_cents + excluded.balance_cents
+    """, [(group_id, user_id, delta) for user_id, delta in deltas.items() if delta])
+
+def _add_contacts(c, user_id, others):
+    """Record `user_id` and each of `others` as each other's contacts."""
+    pairs = [(user_id, other) for other in others if other != user_id]
+    c.executemany("INSERT OR IGNORE INTO contacts (user_id, contact_id) VALUES (?, ?)",
+                  pairs + [(other, user_id) for user_id, other in pairs])
+
+def add_to_rollups(c, first_expense_id):
+    """Add expenses from `first_expense_id` on to the spending rollups.
+
+    Called in the transaction that inserted those expenses. Also bumps the
+    "expenses:<payer_id>" data version of each payer, so only their cached
+    dashboard queries are refreshed.
+    """
+    # NOT INDEXED keeps SQLite on the expense_id range; with a bound parameter
+    # it otherwise scans all of idx_expenses_payer_month to skip the GROUP BY sort.
+    c.execute(f"""
+        INSERT INTO spending_rollups (user_id, month, category, total_cents, expense_count)
+        SELECT {ROLLUP_COLUMNS} FROM expenses NOT INDEXED WHERE expense_id >= ? {ROLLUP_GROUP_BY}
+        {ROLLUP_UPSERT}
+    """, (first_expense_id,))
+    payers = c.execute("SELECT DISTINCT payer_id FROM expenses NOT INDEXED WHERE expense_id >= ?", (first_expense_id,))
+    for (payer_id,) in payers.fetchall():
+        bump_version(c, f"expenses:{payer_id}")
+
+def add_expense(c, payer_id, amount, merchant, date, category, shares, group_id=None):
+    """Insert an expense and its splits, keeping balances in step.
+
+    `shares` is a list of (user_id, share_amount) pairs. Amounts are stored
+    as integer cents and the date in ISO form. An expense shared with other
+    users must belong to a group, whose balances it updates; a personal
+    expense may have no group. The caller owns the transaction, so the
+    expense, its splits and the balance update are committed together.
+    """
+    shares = [(user_id, to_cents(share)) for user_id, share in shares]
+    if group_id is None and any(user_id != payer_id for user_id, _ in shares):
+        raise ValueError("An expense shared with other users must belong to a group")
+    c.execute("INSERT INTO expenses (payer_id, amount_cents, merchant, date, category, group_id) "
+              "VALUES (?, ?, ?, ?, ?, ?)",
+              (payer_id, to_cents(amount), merchant, normalize_date(date), category, group_id))
+    expense_id = c.lastrowid
+    c.executemany("INSERT INTO expense_splits (expense_id, user_id, share_cents) VALUES (?, ?, ?)",
+                  [(expense_id, user_id, share) for user_id, share in shares])
+
+    deltas = {}
+    for user_id, share in shares:
+        if user_id != payer_id:
+            deltas[user_id] = deltas.get(user_id, 0) - share
+            deltas[payer_id] = deltas.get(payer_id, 0) + share
+    _apply_balance_deltas(c, group_id, deltas)
+    _add_contacts(c, payer_id, {user_id for user_id, _ in shares})
+    add_to_rollups(c, expense_id)
+    return expense_id
+
+def add_payment(c, from_user_id, to_user_id, amount, date, group_id=None):
+    """Insert a payment between two users of a group, keeping its balances in step."""
+    if group_id is None and from_user_id != to_user_id:
+        raise ValueError("A payment between users must belong to a group")
+    amount = to_cents(amount)
+    c.execute("INSERT INTO payments (from_user_id, to_user_id, amount_cents, date, group_id) VALUES (?, ?, ?, ?, ?)",
+              (from_user_id, to_user_id, amount, normalize_date(date), group_id))
+    payment_id = c.lastrowid
+    if from_user_id != to_user_id:
+        _apply_balance_deltas(c, group_id, {from_user_id: amount, to_user_id: -amount})
+        _add_contacts(c, from_user_id, [to_user_id])
+    return payment_id
+
+def read_balances(group_id):
+    """Read the stored net balance of every member of a group with a non-zero balance."""
+    df = pd.read_sql_query(
+        "SELECT user_id, balance_cents / 100.0 AS balance FROM balances WHERE group_id = ? AND balance_cents != 0",
+        get_connection(), params=(group_id,))
+    return df.set_index("user_id")["balance"]
+
+def _compute_balance_cents(group_id=None, include_archive=True):
+    """Recompute net balances in cents from the raw tables, indexed by (group_id, user_id).
+
+    With `group_id`, only that group's expenses, splits and payments are
+    read, through the group indexes. With `include_archive`, archived
+    expenses and splits are read too (see archive.py).
+    """
+    conn = get_connection()
+    condition, params = ("= ?", (group_id,)) if group_id is not None else ("IS NOT NULL", ())
+    splits = pd.read_sql_query(
+        "SELECT s.expense_id, s.user_id, s.share_cents AS share_amount "
+        f"FROM expense_splits s JOIN expenses e USING (expense_id) WHERE e.group_id {condition}",
+        conn, params=params)
+    expenses = pd.read_sql_query(
+        f"SELECT expense_id, payer_id, group_id FROM expenses WHERE group_id {condition}", conn, params=params)
+    payments = pd.read_sql_query(
+        "SELECT group_id, from_user_id, to_user_id, amount_cents AS amount "
+        f"FROM payments WHERE group_id {condition}", conn, params=params)
+    if include_archive:
+        archived = read_archive("expenses", ["expense_id", "payer_id", "group_id"],
+                                **({"group_id": group_id} if group_id is not None else {})).dropna()
+        if not archived.empty:
+            archived_splits = read_archive(
+                "expense_splits", **({"expense_id": archived["expense_id"].tolist()} if group_id is not None else {}))
+            expenses = pd.concat([expenses, archived.astype("int64")], ignore_index=True)
+            splits = pd.concat([splits, archived_splits.rename(columns={"share_cents": "share_amount"})],
+                               ignore_index=True)
+    return net_balances(splits, expenses, payments, by="group_id").astype("int64")
+
+def compute_balances(group_id=None, include_archive=True):
+    """Recompute net balances from the raw expense, split and payment tables."""
+    return _compute_balance_cents(group_id, include_archive) / 100
+
+def rebuild_balances():
+    """Replace the balances table with values recomputed from the raw tables."""
+    with transaction() as c:
+        balances = _compute_balance_cents()
+        c.execute("DELETE FROM balances")
+        c.executemany("INSERT INTO balances (group_id, user_id, balance_cents) VALUES (?, ?, ?)",
+                      [(int(group_id), int(user_id), int(value))
+                       for (group_id, user_id), value in balances.items() if value])
+    return len(balances)
+
+def verify_balances():
+    """Compare stored balances against a full recomputation.
+
+    Returns a DataFrame with one row per (group, user) whose stored and
+    recomputed balances (in cents) differ.
+    """
+    stored = pd.read_sql_query("SELECT group_id, user_id, balance_cents FROM balances", get_connection())
+    stored = stored.set_index(["group_id", "user_id"])["balance_cents"].rename("stored")
+    expected = _compute_balance_cents().rename("expected")
+    both = pd.concat([stored, expected], axis=1).fillna(0).astype("int64")
+    return both[both["stored"] != both["expected"]]
+
+def _archived_rollups():
+    """Return per (user, month, category) totals and counts of the archived expenses."""
+    archived = read_archive("expenses", ["payer_id", "month", "category", "amount_cents"])
+    return (archived.fillna({"category": "Uncategorized"}).rename(columns={"payer_id": "user_id"})
+            .groupby(["user_id", "month", "category"])["amount_cents"]
+            .agg(total_cents="sum", expense_count="size"))
+
+def rebuild_rollups(include_archive=True):
+    """Replace the spending rollups with totals recomputed from the expenses table and the archive.
+
+    Bumps the global "expenses" data version, which refreshes every user's
+    cached dashboard queries.
+    """
+    with transaction() as c:
+        c.execute("DELETE FROM spending_rollups")
+        c.execute(f"INSERT INTO spending_rollups (user_id, month, category, total_cents, expense_count) "
+                  f"SELECT {ROLLUP_COLUMNS} FROM expenses {ROLLUP_GROUP_BY}")
+        if include_archive:
+            archived = _archived_rollups().reset_index()
+            c.executemany("INSERT INTO spending_rollups (user_id, month, category, total_cents, expense_count) "
+                          f"VALUES (?, ?, ?, ?, ?) {ROLLUP_UPSERT}",
+                          zip(*(archived[column].tolist() for column in archived.columns)))
+        rows = c.execute("SELECT COUNT(*) FROM spending_rollups").fetchone()[0]
+        bump_version(c, "expenses")
+    return rows
+
+def rebuild_contacts(include_archive=True):
+    """Replace the contacts table with the pairs found in the raw tables and the archive."""
+    with transaction() as c:
+        c.execute("DELETE FROM contacts")
+        c.execute(f"INSERT INTO contacts (user_id, contact_id) {CONTACTS_SELECT}")
+        if include_archive:
+            shared = read_archive("expense_splits", ["expense_id", "user_id"]).merge(
+                read_archive("expenses", ["expense_id", "payer_id"]), on="expense_id")
+            shared = shared[shared["user_id"] != shared["payer_id"]]
+            pairs = set(zip(shared["payer_id"].tolist(), shared["user_id"].tolist()))
+            c.executemany("INSERT OR IGNORE INTO contacts (user_id, contact_id) VALUES (?, ?)",
+                          pairs | {(b, a) for a, b in pairs})
+        return c.execute("SELECT COUNT(*) FROM contacts").fetchone()[0]
+
+def verify_rollups(include_archive=True):
+    """Compare stored spending rollups against a full recomputation.
+
+    Returns a DataFrame with one row per (user, month, category) whose
+    stored and recomputed totals or counts differ.
+    """
+    conn = get_connection()
+    key = ["user_id", "month", "category"]
+    stored = pd.read_sql_query("SELECT user_id, month, category, total_cents, expense_count "
+                               "FROM spending_rollups", conn).set_index(key)
+    expected = pd.read_sql_query(
+        f"SELECT payer_id AS user_id, COALESCE(month, '') AS month, "
+        f"COALESCE(category, 'Uncategorized') AS category, SUM(amount_cents) AS total_cents, "
+        f"COUNT(*) AS expense_count FROM expenses {ROLLUP_GROUP_BY}", conn).set_index(key)
+    if include_archive:
+        expected = expected.add(_archived_rollups(), fill_value=0)
+    both = stored.join(expected, how="outer", lsuffix="_stored", rsuffix="_expected").fillna(0).astype("int64")
+    differs = ((both["total_cents_stored"] != both["total_cents_expected"])
+               | (both["expense_count_stored"] != both["expense_count_expected"]))
+    return both[differs]
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "verify"
+    if command == "rebuild":
+        print(f"Rebuilt {rebuild_balances()} group balances.")
+        print(f"Rebuilt {rebuild_rollups()} spending rollup rows.")
+        print(f"Rebuilt {rebuild_contacts()} contact pairs.")
+    elif command == "verify":
+        mismatches = verify_balances()
+        rollup_mismatches = verify_rollups()
+        if mismatches.empty and rollup_mismatches.empty:
+            print("Balances and spending rollups are consistent.")
+        else:
+            if not mismatches.empty:
+                print(mismatches.to_string())
+            if not rollup_mismatches.empty:
+                print(rollup_mismatches.to_string())
+            sys.exit(1)
+    else:
+        sys.exit(f"Unknown command: {command} (expected 'rebuild' or 'verify')")
@@ -0,0 +1,119 @@
+import io
+import os
+import hashlib
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from PIL import Image, ImageOps
+import pytesseract
+from db import get_connection, transaction
+
+# Receipts wider than this are downscaled before OCR; tesseract gains
+# nothing from phone-camera resolution but pays for every pixel.
+MAX_OCR_WIDTH = 1600
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def image_hash(data):
+    """Return the content hash used as the OCR cache key."""
+    return hashlib.sha256(data).hexdigest()
+
+def preprocess_image(image):
+    """Convert a receipt image to grayscale and downscale it for OCR."""
+    image = ImageOps.exif_transpose(image).convert("L")
+    if image.width > MAX_OCR_WIDTH:
+        height = round(image.height * MAX_OCR_WIDTH / image.width)
+        image = image.resize((MAX_OCR_WIDTH, height), Image.LANCZOS)
+    return image
+
+def ocr_bytes(data):
+    """OCR raw image bytes. Runs inside a worker process.
+
+    pytesseract's exceptions cannot be unpickled, and one that reached the
+    parent would break the whole pool, so they are raised as RuntimeError.
+    """
+    image = preprocess_image(Image.open(io.BytesIO(data)))
+    try:
+        return pytesseract.image_to_string(image)
+    except (pytesseract.TesseractError, pytesseract.TesseractNotFoundError) as exc:
+        raise RuntimeError(f"tesseract failed: {exc}") from None
+
+def get_pool():
+    """Return the process-wide OCR worker pool, starting it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = max(1, (os.cpu_count() or 2) // 2)
+            # spawn rather than fork: the Streamlit server process is multi-threaded.
+            _pool = ProcessPoolExecutor(max_workers=workers,
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+def _discard_pool(pool):
+    """Forget a broken pool so the next get_pool() starts a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+
+def _submit(data):
+    """Queue one image for OCR and return (pool, future).
+
+    A pool that has broken since it was last used is replaced once.
+    """
+    pool = get_pool()
+    try:
+        return pool, pool.submit(ocr_bytes, data)
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        pool = get_pool()
+        return pool, pool.submit(ocr_bytes, data)
+
+def cached_text(digest):
+    """Return the stored OCR text for an image hash, or None."""
+    row = get_connection().execute("SELECT text FROM ocr_cache WHERE image_hash = ?", (digest,)).fetchone()
+    return row[0] if row else None
+
+def store_text(digest, text):
+    """Store the OCR text for an image hash."""
+    with transaction() as c:
+        c.execute("INSERT OR REPLACE INTO ocr_cache (image_hash, text) VALUES (?, ?)", (digest, text))
+
+def ocr_receipts(uploads):
+    """OCR a batch of (name, image bytes) pairs, yielding results as they finish.
+
+    Yields (name, image_hash, text, error) tuples, once per distinct image.
+    Images seen before are answered from the cache straight away; the rest
+    are OCR'd in the worker pool and yielded in completion order, then
+    cached. An image that cannot be read is yielded with text None and the
+    exception as `error`, is not cached, and does not stop the others. If
+    a worker dies, the broken pool is discarded so the next batch starts a
+    new one.
+    """
+    cached, pending, seen = [], {}, set()
+    for name, data in uploads:
+        digest = image_hash(data)
+        if digest in seen:
+            continue
+        seen.add(digest)
+        text = cached_text(digest)
+        if text is not None:
+            cached.append((name, digest, text, None))
+        else:
+            pool, future = _submit(data)
+            pending[future] = (name, digest, pool)
+
+    yield from cached
+    for future in as_completed(pending):
+        name, digest, pool = pending[future]
+        try:
+            text = future.result()
+        except Exception as exc:
+            if isinstance(exc, BrokenProcessPool):
+                _discard_pool(pool)
+            yield name, digest, None, exc
+            continue
+        store_text(digest, text)
+        yield name, digest, text, None
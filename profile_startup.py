@@ -0,0 +1,42 @@
+import sys
+import json
+import subprocess
+
+# The login screen before and after page modules were made lazy in app.py.
+SCENARIOS = {
+    "before: eager page imports": "import app, dashboard, expense_input, user_actions, savings_prediction",
+    "after: login screen": "import app",
+}
+
+def profile_imports(statement, repeat=3):
+    """Time `statement` in fresh interpreters with -X importtime.
+
+    Returns the best total import time in milliseconds and the ten slowest
+    imports of that run among the top two nesting levels (e.g. `app` and
+    what `app` itself imports).
+    """
+    best = None
+    for _ in range(repeat):
+        stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                                capture_output=True, text=True, check=True).stderr
+        top_level, nested = [], []
+        for line in stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, cumulative, name = line[len("import time:"):].split("|")
+            if not cumulative.strip().isdigit():
+                continue
+            depth = (len(name) - len(name.lstrip())) // 2
+            entry = (name.strip(), int(cumulative) / 1000)
+            if depth == 0:
+                top_level.append(entry)
+            if depth <= 1:
+                nested.append(entry)
+        total = sum(ms for _, ms in top_level)
+        if best is None or total < best[0]:
+            best = (total, sorted(nested, key=lambda item: item[1], reverse=True)[:10])
+    return {"total_ms": round(best[0], 1), "slowest": [{"module": m, "ms": round(ms, 1)} for m, ms in best[1]]}
+
+if __name__ == "__main__":
+    report = {name: profile_imports(statement) for name, statement in SCENARIOS.items()}
+    print(json.dumps(report, indent=2))
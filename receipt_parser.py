@@ -0,0 +1,116 @@
+import re
+import sys
+import json
+import time
+
+# All patterns are compiled once at import time; parse_receipt only runs them.
+AMOUNT_RE = re.compile(r"(?<![\d.,])[$€£]?\s?(\d{1,3}(?:,\d{3})+|\d+)[.,](\d{2})(?![\d%]|\.\d)")
+TOTAL_RE = re.compile(r"\b(grand\s*total|total\s*due|amount\s*due|balance\s*due|total|amount|due)\b", re.I)
+SUBTOTAL_RE = re.compile(r"\b(sub\s*-?\s*total)\b", re.I)
+NOT_TOTAL_RE = re.compile(r"\b(tax|vat|gst|tip|change|cash|tendered|discount|savings|saved|points|qty)\b", re.I)
+
+MONTHS = {name: i for i, names in enumerate(
+    [("jan", "january"), ("feb", "february"), ("mar", "march"), ("apr", "april"),
+     ("may",), ("jun", "june"), ("jul", "july"), ("aug", "august"),
+     ("sep", "sept", "september"), ("oct", "october"), ("nov", "november"), ("dec", "december")],
+    start=1) for name in names}
+_MONTH_NAMES = "|".join(sorted(MONTHS, key=len, reverse=True))
+DATE_PATTERNS = (
+    (re.compile(r"\b(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})\b"), ("y", "m", "d")),
+    (re.compile(r"\b(\d{1,2})/(\d{1,2})/(\d{4}|\d{2})\b"), ("m", "d", "y")),
+    (re.compile(r"\b(\d{1,2})[.-](\d{1,2})[.-](\d{4}|\d{2})\b"), ("d", "m", "y")),
+    (re.compile(rf"\b(\d{{1,2}})(?:st|nd|rd|th)?[\s-]({_MONTH_NAMES})\.?[\s,-]*(\d{{4}})\b", re.I), ("d", "m", "y")),
+    (re.compile(rf"\b({_MONTH_NAMES})\.?\s+(\d{{1,2}})(?:st|nd|rd|th)?,?\s+(\d{{4}})\b", re.I), ("m", "d", "y")),
+)
+
+HEADER_SKIP_RE = re.compile(
+    r"\b(receipt|invoice|welcome|thank|tel|phone|fax|www|http|store\s*#|order|table|server|cashier|"
+    r"street|st\.|ave|road|rd\.|blvd|suite|date|time)\b", re.I)
+LETTER_RE = re.compile(r"[A-Za-z]")
+TRIM_RE = re.compile(r"^[\W_]+|[\W_]+$")
+
+def _to_amount(match):
+    """Convert an AMOUNT_RE match to a float."""
+    return float(match.group(1).replace(",", "") + "." + match.group(2))
+
+def find_amount(lines):
+    """Pick the receipt total from its lines.
+
+    Every amount is scored by the keywords on its line: totals score highest,
+    subtotals lower, and tax/change/tender lines are penalised. Ties go to the
+    larger amount, then to the later line.
+    """
+    best = None
+    for index, line in enumerate(lines):
+        matches = list(AMOUNT_RE.finditer(line))
+        if not matches:
+            continue
+        score = 0
+        if TOTAL_RE.search(line):
+            score += 3
+        if SUBTOTAL_RE.search(line):
+            score -= 2
+        if NOT_TOTAL_RE.search(line):
+            score -= 4
+        candidate = (score, _to_amount(matches[-1]), index)
+        if best is None or candidate > best:
+            best = candidate
+    return best[1] if best else None
+
+def find_date(text):
+    """Return the first date found in the text as an ISO YYYY-MM-DD string."""
+    for pattern, order in DATE_PATTERNS:
+        for match in pattern.finditer(text):
+            parts = dict(zip(order, match.groups()))
+            month = parts["m"]
+            month = MONTHS.get(month.lower()) if not month.isdigit() else int(month)
+            day, year = int(parts["d"]), int(parts["y"])
+            if year < 100:
+                year += 2000
+            if month and 1 <= month <= 12 and 1 <= day <= 31 and 1990 <= year <= 2100:
+                return f"{year:04d}-{month:02d}-{day:02d}"
+    return None
+
+def find_merchant(lines, header_lines=6):
+    """Return the first header line that looks like a business name."""
+    for line in lines[:header_lines]:
+        if len(LETTER_RE.findall(line)) < 3 or HEADER_SKIP_RE.search(line):
+            continue
+        digits = sum(ch.isdigit() for ch in line)
+        if digits > len(line) // 3 or AMOUNT_RE.search(line):
+            continue
+        return TRIM_RE.sub("", line)
+    return None
+
+def parse_receipt(text):
+    """Extract (amount, merchant, date) from receipt OCR text.
+
+    Any field that cannot be found is returned as None.
+    """
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    return find_amount(lines), find_merchant(lines), find_date(text)
+
+def evaluate(fixtures, repeat=200):
+    """Score the parser against labeled fixtures and measure its throughput."""
+    correct = {"amount": 0, "merchant": 0, "date": 0}
+    for fixture in fixtures:
+        amount, merchant, date = parse_receipt(fixture["text"])
+        correct["amount"] += amount == fixture["amount"]
+        correct["merchant"] += merchant == fixture["merchant"]
+        correct["date"] += date == fixture["date"]
+
+    texts = [fixture["text"] for fixture in fixtures] * repeat
+    started = time.perf_counter()
+    for text in texts:
+        parse_receipt(text)
+    elapsed = time.perf_counter() - started
+    return {
+        "receipts": len(fixtures),
+        "accuracy": {field: hits / len(fixtures) for field, hits in correct.items()},
+        "receipts_per_second": len(texts) / elapsed,
+    }
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "receipt_fixtures.json"
+    with open(path) as f:
+        print(json.dumps(evaluate(json.load(f)), indent=2))
@@ -0,0 +1,219 @@
+import re
+import argparse
+from datetime import date
+import numpy as np
+import pandas as pd
+from archive import read_archive
+from db import bump_version, get_connection, get_version, transaction
+
+WATERMARK = "recurring_expense_id"  # app_state key holding the last expense id examined
+USERS_PER_CHUNK = 2_000
+MIN_CHARGES = 3
+REGULAR_SHARE = 0.75  # share of the gaps between charges that must match the period
+AMOUNT_TOLERANCE = 0.25  # median relative deviation from the typical amount
+MAX_MISSED = 1  # a series that missed more expected charges is treated as cancelled
+AVERAGE_MONTH_DAYS = 30.44
+
+# name: (typical days between charges, allowed deviation in days, step to the next charge)
+PERIODS = {
+    "weekly": (7, 1, pd.DateOffset(weeks=1)),
+    "biweekly": (14, 2, pd.DateOffset(weeks=2)),
+    "monthly": (30, 4, pd.DateOffset(months=1)),
+    "quarterly": (91, 10, pd.DateOffset(months=3)),
+    "yearly": (365, 20, pd.DateOffset(years=1)),
+}
+
+SERIES_COLUMNS = ["user_id", "merchant_key", "merchant", "category", "period", "amount_cents", "charges",
+                  "first_date", "last_date", "next_date"]
+HISTORY_COLUMNS = ["payer_id", "merchant", "date", "amount_cents", "category"]
+
+# Parts of a merchant name that change between charges from the same
+# merchant: store numbers and references, processor prefixes, suffixes.
+NOISE = re.compile(r"\b(?:\w*\d\w*|inc|llc|ltd|co|corp|com|www|pos|sq|paypal|purchase|payment|debit|card|ach)\b")
+
+def normalize_merchants(merchants):
+    """Reduce raw merchant names to comparable ones, e.g. "NETFLIX.COM 866-579" -> "netflix".
+
+    Only the distinct names are normalized, so the cost depends on the
+    number of merchants rather than the number of expenses.
+    """
+    codes, uniques = pd.factorize(merchants.fillna(""))
+    cleaned = (pd.Series(uniques, dtype=object).str.lower()
+               .str.replace(r"[^a-z0-9]+", " ", regex=True)
+               .str.replace(NOISE, " ", regex=True)
+               .str.split().str.join(" "))
+    return pd.Series(cleaned.to_numpy(dtype=object)[codes], index=merchants.index, dtype=object)
+
+def merchant_keys(names):
+    """Hash normalized merchant names to stable signed 64-bit keys that fit an SQLite INTEGER."""
+    return pd.util.hash_array(np.asarray(names, dtype=object)).view(np.int64)
+
+def detect(expenses, pairs=None):
+    """Find recurring charges in a frame of expenses with HISTORY_COLUMNS.
+
+    Charges are grouped by payer and hashed merchant name, and all groups
+    are tested together with grouped operations: a series needs at least
+    MIN_CHARGES charge days whose median gap matches one of PERIODS, with
+    most gaps within the period's tolerance and a stable amount. With
+    `pairs` (a MultiIndex of (payer_id, merchant_key)), only those groups
+    are tested. Returns one row per series with SERIES_COLUMNS.
+    """
+    frame = expenses.assign(name=normalize_merchants(expenses["merchant"]),
+                            date=pd.to_datetime(expenses["date"], format="%Y-%m-%d", errors="coerce"))
+    frame = frame[(frame["name"] != "") & frame["date"].notna()]
+    frame = frame.assign(merchant_key=merchant_keys(frame["name"]))
+    if pairs is not None:
+        frame = frame[pd.MultiIndex.from_arrays([frame["payer_id"], frame["merchant_key"]]).isin(pairs)]
+
+    key = ["payer_id", "merchant_key"]
+    # Several charges on the same day count as one.
+    charges = (frame.sort_values(key + ["date"])
+               .groupby(key + ["date"], sort=False)
+               .agg(amount_cents=("amount_cents", "sum"), merchant=("merchant", "last"), category=("category", "last"))
+               .reset_index())
+    charges["gap"] = charges.groupby(key, sort=False)["date"].diff().dt.days
+    charges["typical_amount"] = charges.groupby(key, sort=False)["amount_cents"].transform("median")
+    charges["deviation"] = (charges["amount_cents"] - charges["typical_amount"]).abs() / charges["typical_amount"]
+    series = charges.groupby(key, sort=False).agg(
+        charges=("date", "size"), first_date=("date", "first"), last_date=("date", "last"),
+        amount_cents=("typical_amount", "first"), merchant=("merchant", "last"), category=("category", "last"),
+        gap=("gap", "median"), deviation=("deviation", "median"))
+
+    series["period"], series["days"], series["tolerance"] = None, np.nan, np.nan
+    for name, (days, tolerance, _) in PERIODS.items():
+        matches = (series["gap"] - days).abs() <= tolerance
+        series.loc[matches, ["period", "days", "tolerance"]] = name, days, tolerance
+    period = charges.join(series[["days", "tolerance"]], on=key)
+    regular = ((period["gap"] - period["days"]).abs() <= period["tolerance"]).groupby(
+        [charges["payer_id"], charges["merchant_key"]], sort=False).sum()
+    series["regular"] = regular / (series["charges"] - 1).clip(lower=1)
+    series = series[(series["charges"] >= MIN_CHARGES) & series["period"].notna()
+                    & (series["regular"] >= REGULAR_SHARE) & (series["deviation"] <= AMOUNT_TOLERANCE)].copy()
+
+    series["next_date"] = series["last_date"]
+    for name, (_, _, step) in PERIODS.items():
+        matches = series["period"] == name
+        series.loc[matches, "next_date"] = series.loc[matches, "last_date"] + step
+    series["amount_cents"] = series["amount_cents"].round().astype("int64")
+    for column in ("first_date", "last_date", "next_date"):
+        series[column] = series[column].dt.strftime("%Y-%m-%d")
+    series["category"] = series["category"].astype(object).where(series["category"].notna(), None)
+    return series.reset_index().rename(columns={"payer_id": "user_id"})[SERIES_COLUMNS]
+
+def _history(user_ids):
+    """Read every expense paid by `user_ids`, including archived months."""
+    live = pd.read_sql_query(
+        f"SELECT {', '.join(HISTORY_COLUMNS)} FROM expenses WHERE payer_id IN ({','.join('?' * len(user_ids))})",
+        get_connection(), params=list(user_ids))
+    archived = read_archive("expenses", HISTORY_COLUMNS, payer_id=list(user_ids))
+    return live if archived.empty else pd.concat([live, archived], ignore_index=True)
+
+def update_recurring(full=False, users_per_chunk=USERS_PER_CHUNK):
+    """Detect recurring charges among the expenses added since the last run.
+
+    Only the (user, merchant) pairs that have a new expense are examined
+    again, each over its full history, and their stored series are
+    replaced. Users are processed in chunks of `users_per_chunk`, one
+    transaction each. With `full`, every user is examined from scratch.
+    Bumps the "recurring:<user_id>" data version of each user examined, or
+    the global "recurring" version after a full run.
+    Returns {"expenses": new expenses, "pairs": pairs examined, "series": series stored}.
+    """
+    conn = get_connection()
+    since = 0 if full else get_version(WATERMARK)
+    until = max(since, conn.execute("SELECT COALESCE(MAX(expense_id), 0) FROM expenses").fetchone()[0])
+    new = pd.read_sql_query("SELECT payer_id, merchant FROM expenses WHERE expense_id > ? AND expense_id <= ?",
+                            conn, params=(since, until))
+    read = len(new)
+    if full:
+        user_ids, pairs = [row[0] for row in conn.execute("SELECT user_id FROM users ORDER BY user_id")], None
+    else:
+        names = normalize_merchants(new["merchant"])
+        new = new[names != ""].assign(merchant_key=merchant_keys(names[names != ""]))
+        pairs = pd.MultiIndex.from_frame(new[["payer_id", "merchant_key"]]).unique()
+        user_ids = sorted(pairs.get_level_values(0).unique().tolist())
+
+    examined = stored = 0
+    for start in range(0, len(user_ids), users_per_chunk):
+        chunk = user_ids[start:start + users_per_chunk]
+        chunk_pairs = None if pairs is None else pairs[pairs.get_level_values(0).isin(chunk)]
+        series = detect(_history(chunk), chunk_pairs)
+        with transaction() as c:
+            if chunk_pairs is None:
+                c.executemany("DELETE FROM recurring_series WHERE user_id = ?", [(user_id,) for user_id in chunk])
+            else:
+                c.executemany("DELETE FROM recurring_series WHERE user_id = ? AND merchant_key = ?",
+                              [(int(user_id), int(key)) for user_id, key in chunk_pairs])
+                examined += len(chunk_pairs)
+            c.executemany(f"INSERT INTO recurring_series ({', '.join(SERIES_COLUMNS)}) "
+                          f"VALUES ({', '.join('?' * len(SERIES_COLUMNS))})", series.itertuples(index=False))
+            if chunk_pairs is not None:
+                for user_id in chunk:
+                    bump_version(c, f"recurring:{user_id}")
+        stored += len(series)
+    with transaction() as c:
+        c.execute("INSERT INTO app_state (key, value) VALUES (?, ?) "
+                  "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (WATERMARK, until))
+        if full:
+            bump_version(c, "recurring")
+    return {"expenses": read, "pairs": examined, "series": stored}
+
+def read_series(user_id):
+    """Return a user's stored recurring series, soonest next charge first."""
+    return pd.read_sql_query(
+        "SELECT merchant, category, period, amount_cents / 100.0 AS amount, charges, first_date, last_date, next_date "
+        "FROM recurring_series WHERE user_id = ? ORDER BY next_date, merchant",
+        get_connection(), params=(user_id,))
+
+def upcoming_charges(user_id, days=30, today=None):
+    """Return the recurring charges a user can expect in the next `days` days.
+
+    Each series is rolled forward from its next expected charge. A charge
+    that is late by no more than the period's tolerance is still listed,
+    and series that missed more than MAX_MISSED charges are left out as
+    cancelled. Returns a DataFrame with date, merchant, category and amount.
+    """
+    today = pd.Timestamp(today or date.today())
+    end = today + pd.Timedelta(days=days)
+    rows = []
+    for series in read_series(user_id).itertuples():
+        _, tolerance, step = PERIODS[series.period]
+        due, missed = pd.Timestamp(series.next_date), 0
+        while due + pd.Timedelta(days=tolerance) < today and missed <= MAX_MISSED:
+            due, missed = due + step, missed + 1
+        if missed > MAX_MISSED:
+            continue
+        while due < end:
+            rows.append((due.strftime("%Y-%m-%d"), series.merchant, series.category, series.amount))
+            due += step
+    return pd.DataFrame(rows, columns=["date", "merchant", "category", "amount"]).sort_values("date", ignore_index=True)
+
+def recurring_by_month(user_id):
+    """Return a user's recurring spend per month (YYYY-MM) over each series' active months.
+
+    A series counts its amount scaled to an average month, e.g. a weekly
+    charge about 4.3 times, from the month of its first charge to the
+    month of its last.
+    """
+    totals = {}
+    for series in read_series(user_id).itertuples():
+        per_month = series.amount * AVERAGE_MONTH_DAYS / PERIODS[series.period][0]
+        for month in pd.period_range(series.first_date, series.last_date, freq="M").strftime("%Y-%m"):
+            totals[month] = totals.get(month, 0) + per_month
+    return pd.Series(totals, dtype=float).sort_index()
+
+if __name__ == "__main__":
+    from db import set_db_path
+    from db_init import init_db
+
+    parser = argparse.ArgumentParser(description="Detect recurring charges in the expenses added since the last run.")
+    parser.add_argument("--db", help="database file (default: XPENSEAI_DB or xpenseai.db)")
+    parser.add_argument("--full", action="store_true", help="examine every user's full history again")
+    args = parser.parse_args()
+
+    if args.db:
+        set_db_path(args.db)
+    init_db()
+    summary = update_recurring(full=args.full)
+    print(f"Read {summary['expenses']} new expenses and stored {summary['series']} recurring series"
+          + ("" if args.full else f" for {summary['pairs']} changed merchants") + ".")
@@ -0,0 +1,162 @@
+import os
+import argparse
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from db import get_connection, transaction
+
+NUMERICAL_FEATURES = [
+    'Income', 'Age', 'Dependents', 'Disposable_Income', 'Desired_Savings',
+    'Groceries', 'Transport', 'Eating_Out', 'Entertainment', 'Utilities',
+    'Healthcare', 'Education', 'Miscellaneous'
+]
+CATEGORICAL_FEATURES = ['Occupation', 'City_Tier']
+TARGET_COLUMNS = [
+    "Potential_Savings_Groceries", "Potential_Savings_Transport",
+    "Potential_Savings_Eating_Out", "Potential_Savings_Entertainment",
+    "Potential_Savings_Utilities", "Potential_Savings_Healthcare",
+    "Potential_Savings_Education", "Potential_Savings_Miscellaneous"
+]
+
+# Profile values used for every user until the app collects them.
+DEFAULT_INPUT = {
+    "Income": 20000.0,
+    "Age": 30,
+    "Dependents": 1,
+    "Disposable_Income": 15000.0,
+    "Desired_Savings": 5000.0,
+    "Groceries": 0.0,
+    "Transport": 0.0,
+    "Eating_Out": 0.0,
+    "Entertainment": 0.0,
+    "Utilities": 0.0,
+    "Healthcare": 0.0,
+    "Education": 0.0,
+    "Miscellaneous": 0.0,
+    "Occupation": "Professional",  # Adjust if needed
+    "City_Tier": "Tier_1"         # Updated default to a common alternative
+}
+
+def previous_month(today=None):
+    """Return the YYYY-MM key of the month before `today`."""
+    today = today or datetime.today()
+    return (today.replace(day=1) - timedelta(days=1)).strftime("%Y-%m")
+
+def build_feature_frame(month, user_ids=None):
+    """Build one model input row per user from their spending in `month`.
+
+    Category averages for all requested users come from the spending
+    rollups in one query; users without expenses that month keep the
+    default inputs.
+    """
+    conn = get_connection()
+    if user_ids is None:
+        user_ids = pd.read_sql_query("SELECT user_id FROM users", conn)["user_id"].tolist()
+        user_filter, params = "", (month,)
+    else:
+        user_filter = f"AND user_id IN ({','.join('?' * len(user_ids))})"
+        params = (month, *user_ids)
+    averages = pd.read_sql_query(f"""
+        SELECT user_id, category, total_cents / 100.0 / expense_count AS avg_amount
+        FROM spending_rollups
+        WHERE month = ? AND expense_count > 0 {user_filter}
+    """, conn, params=params)
+    by_category = averages.pivot(index="user_id", columns="category", values="avg_amount")
+
+    frame = pd.DataFrame([DEFAULT_INPUT] * len(user_ids), index=pd.Index(user_ids, name="user_id"))
+    spending = by_category.reindex(index=frame.index, columns=["Food", "Transportation", "Entertainment"]).fillna(0.0)
+    frame["Groceries"] = spending["Food"]
+    frame["Eating_Out"] = spending["Food"] * 0.5
+    frame["Transport"] = spending["Transportation"]
+    frame["Entertainment"] = spending["Entertainment"]
+    return frame
+
+def preprocess_batch(frame, scaler, encoder):
+    """Turn a frame of raw inputs into the (n, 18) model matrix in one pass.
+
+    Raises ValueError if a categorical value is unknown to the encoder.
+    """
+    scaled = scaler.transform(frame[NUMERICAL_FEATURES].astype(float))
+    encoded = encoder.transform(frame[CATEGORICAL_FEATURES])
+    return np.hstack([scaled, encoded])
+
+def scenario_grid(base, x_feature, x_values, y_feature=None, y_values=None):
+    """Build one model input row per combination of `x_values` and `y_values`.
+
+    Every other input keeps its value from `base`. Rows are ordered with x
+    varying fastest, so predictions reshape to (len(y_values), len(x_values)).
+    """
+    x_values = np.asarray(x_values, dtype=float)
+    repeats = len(y_values) if y_feature is not None else 1
+    frame = pd.DataFrame(base, index=pd.RangeIndex(len(x_values) * repeats))
+    frame[x_feature] = np.tile(x_values, repeats)
+    if y_feature is not None:
+        frame[y_feature] = np.repeat(np.asarray(y_values, dtype=float), len(x_values))
+    return frame
+
+def predict_frame(frame, model, scaler, encoder, batch_size=4096):
+    """Predict every row of a frame of raw inputs in one batch; return a frame of TARGET_COLUMNS."""
+    predictions = model.predict(preprocess_batch(frame, scaler, encoder), batch_size=batch_size, verbose=0)
+    return pd.DataFrame(predictions, columns=TARGET_COLUMNS, index=frame.index)
+
+def load_artifacts(version=None):
+    """Load the savings model, scaler and encoder from disk.
+
+    Loads `version`, or the latest version written by train.py. Before the
+    first training run it uses the exported NumPy weights (see
+    savings_inference.py) when they are present, so serving does not need
+    TensorFlow, and falls back to Keras.
+    """
+    from savings_inference import WEIGHTS_PATH, latest_version, load_numpy_artifacts, version_path
+    version = version or latest_version()
+    if version is not None:
+        return load_numpy_artifacts(version_path(version))
+    if os.path.exists(WEIGHTS_PATH):
+        return load_numpy_artifacts(WEIGHTS_PATH)
+    return load_keras_artifacts()
+
+def load_keras_artifacts():
+    """Load the Keras model and the pickled scaler and encoder."""
+    import joblib
+    import tensorflow as tf
+    model = tf.keras.models.load_model("savings_model.h5")
+    scaler = joblib.load("scaler.pkl")
+    encoder = joblib.load("encoder.pkl")
+    return model, scaler, encoder
+
+def run_batch(month=None, artifacts=None, batch_size=1024):
+    """Predict savings for every user for `month` and store the results.
+
+    Returns the number of users scored.
+    """
+    month = month or previous_month()
+    model, scaler, encoder = artifacts or load_artifacts()
+    frame = build_feature_frame(month)
+    if frame.empty:
+        return 0
+    predictions = model.predict(preprocess_batch(frame, scaler, encoder), batch_size=batch_size, verbose=0)
+
+    columns = ", ".join(TARGET_COLUMNS)
+    placeholders = ", ".join("?" * len(TARGET_COLUMNS))
+    rows = [(int(user_id), month, *map(float, row)) for user_id, row in zip(frame.index, predictions)]
+    with transaction() as c:
+        c.executemany(f"INSERT OR REPLACE INTO savings_predictions (user_id, month, {columns}) "
+                      f"VALUES (?, ?, {placeholders})", rows)
+    return len(rows)
+
+def read_prediction(user_id, month):
+    """Return the stored prediction for a user and month as a Series, or None."""
+    df = pd.read_sql_query(f"SELECT {', '.join(TARGET_COLUMNS)} FROM savings_predictions "
+                           "WHERE user_id = ? AND month = ?", get_connection(), params=(user_id, month))
+    return df.iloc[0] if not df.empty else None
+
+if __name__ == "__main__":
+    from db_init import init_db
+
+    parser = argparse.ArgumentParser(description="Predict monthly savings for every user.")
+    parser.add_argument("--month", help="month to score as YYYY-MM (default: previous month)")
+    args = parser.parse_args()
+
+    init_db()
+    month = args.month or previous_month()
+    print(f"Stored predictions for {run_batch(month)} users for {month}.")
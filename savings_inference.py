@@ -0,0 +1,217 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import subprocess
+import numpy as np
+
+WEIGHTS_PATH = "savings_model.npz"
+# Versioned artifacts written by train.py; MODELS_DIR/LATEST names the one to serve.
+MODELS_DIR = os.environ.get("XPENSEAI_MODELS_DIR", "models")
+# Activations the forward pass implements besides relu; "None" is how a missing one is stored.
+IDENTITY_ACTIVATIONS = ("linear", "None", None)
+
+class NumpyScaler:
+    """StandardScaler replacement backed by exported mean/scale arrays."""
+
+    def __init__(self, mean, scale):
+        self.mean_, self.scale_ = mean, scale
+
+    def transform(self, X):
+        return (np.asarray(X, dtype=np.float64) - self.mean_) / self.scale_
+
+class NumpyEncoder:
+    """OneHotEncoder(drop='first') replacement backed by exported categories."""
+
+    def __init__(self, categories, drop_idx):
+        self.categories_, self.drop_idx_ = categories, drop_idx
+        # Row i of each table is the encoded form of category i.
+        self._tables = [np.delete(np.eye(len(cats)), drop, axis=1) for cats, drop in zip(categories, drop_idx)]
+
+    def transform(self, X):
+        X = np.asarray(X, dtype=object)
+        blocks = []
+        for column, (cats, table) in enumerate(zip(self.categories_, self._tables)):
+            values = X[:, column]
+            index = np.full(len(values), -1, dtype=np.intp)
+            for i, category in enumerate(cats):
+                index[values == category] = i
+            if (index < 0).any():
+                raise ValueError(f"Found unknown categories [{values[index < 0][0]!r}] in column {column} during transform")
+            blocks.append(table[index])
+        return np.hstack(blocks)
+
+class NumpyModel:
+    """Forward pass of the exported dense network, with the Keras predict() signature."""
+
+    def __init__(self, layers):
+        self.layers = layers
+
+    def predict(self, X, batch_size=None, verbose=0):
+        out = np.asarray(X, dtype=np.float32)
+        for kernel, bias, activation in self.layers:
+            out = out @ kernel + bias
+            if activation == "relu":
+                np.maximum(out, 0, out=out)
+            elif activation not in IDENTITY_ACTIVATIONS:
+                raise ValueError(f"Unsupported activation for the NumPy engine: {activation}")
+        return out
+
+def _read_keras_layers(model_path):
+    """Read the layer list and weights of a Keras .h5 model with h5py."""
+    import h5py
+    with h5py.File(model_path, "r") as f:
+        config = json.loads(f.attrs["model_config"])
+        group = f["model_weights"]
+        layers = []
+        for layer in config["config"]["layers"]:
+            name = layer["config"]["name"]
+            names = group[name].attrs.get("weight_names", []) if name in group else []
+            weights = {n.split("/")[-1]: group[name][n][()] for n in names}
+            layers.append((layer["class_name"], layer["config"], weights))
+    return layers
+
+def fold_layers(keras_layers):
+    """Turn Dense/BatchNormalization/Dropout layers into plain (kernel, bias, activation) steps.
+
+    Dropout is a no-op at inference. Each BatchNormalization is an affine
+    map, so it is folded into the kernel and bias of the next Dense layer.
+    """
+    steps, scale, shift = [], None, None
+    for class_name, config, weights in keras_layers:
+        if class_name in ("InputLayer", "Dropout"):
+            continue
+        if class_name == "BatchNormalization":
+            s = weights["gamma"] / np.sqrt(weights["moving_variance"] + config["epsilon"])
+            t = weights["beta"] - weights["moving_mean"] * s
+            scale, shift = (s, t) if scale is None else (scale * s, shift * s + t)
+        elif class_name == "Dense":
+            kernel, bias = weights["kernel"].astype(np.float64), weights["bias"].astype(np.float64)
+            if scale is not None:
+                bias = shift @ kernel + bias
+                kernel = scale[:, None] * kernel
+                scale = shift = None
+            steps.append((kernel, bias, config["activation"]))
+        else:
+            raise ValueError(f"Unsupported layer type for NumPy export: {class_name}")
+    if scale is not None:
+        raise ValueError("A BatchNormalization layer must be followed by a Dense layer")
+    return steps
+
+def export_weights(model_path="savings_model.h5", scaler_path="scaler.pkl",
+                   encoder_path="encoder.pkl", out_path=WEIGHTS_PATH):
+    """Convert the Keras model, scaler and encoder into one compact .npz file."""
+    import joblib
+    scaler, encoder = joblib.load(scaler_path), joblib.load(encoder_path)
+    return write_weights(out_path, fold_layers(_read_keras_layers(model_path)), scaler, encoder)
+
+def write_weights(out_path, steps, scaler, encoder):
+    """Write (kernel, bias, activation) steps with the scaler and encoder to one .npz file."""
+    arrays = {"scaler_mean": scaler.mean_, "scaler_scale": scaler.scale_,
+              "drop_idx": np.asarray(encoder.drop_idx_, dtype=np.intp)}
+    for i, cats in enumerate(encoder.categories_):
+        arrays[f"categories_{i}"] = np.asarray(cats, dtype=str)
+    for i, (kernel, bias, activation) in enumerate(steps):
+        arrays[f"kernel_{i}"] = kernel.astype(np.float32)
+        arrays[f"bias_{i}"] = bias.astype(np.float32)
+    arrays["activations"] = np.asarray([activation for _, _, activation in steps], dtype=str)
+    np.savez_compressed(out_path, **arrays)
+    return out_path
+
+def latest_version():
+    """Return the model version named by MODELS_DIR/LATEST, or None before the first training run."""
+    try:
+        with open(os.path.join(MODELS_DIR, "LATEST")) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def version_path(version):
+    """Return the serving weights file of a trained model version."""
+    return os.path.join(MODELS_DIR, version, WEIGHTS_PATH)
+
+def load_numpy_artifacts(path=WEIGHTS_PATH):
+    """Load (model, scaler, encoder) from an exported .npz file."""
+    with np.load(path) as data:
+        layers = [(data[f"kernel_{i}"], data[f"bias_{i}"], str(activation))
+                  for i, activation in enumerate(data["activations"])]
+        unsupported = {activation for _, _, activation in layers} - {"relu", *IDENTITY_ACTIVATIONS}
+        if unsupported:
+            raise ValueError(f"Unsupported activations for the NumPy engine in {path}: {sorted(unsupported)}")
+        n_categorical = len(data["drop_idx"])
+        encoder = NumpyEncoder([data[f"categories_{i}"].astype(object) for i in range(n_categorical)],
+                               data["drop_idx"])
+        scaler = NumpyScaler(data["scaler_mean"], data["scaler_scale"])
+    return NumpyModel(layers), scaler, encoder
+
+def _sample_inputs(n, seed=0):
+    """Draw random but realistic raw inputs covering every category combination."""
+    import pandas as pd
+    from savings_batch import NUMERICAL_FEATURES, CATEGORICAL_FEATURES
+    _, scaler, encoder = load_numpy_artifacts()
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame(np.abs(rng.normal(scaler.mean_, scaler.scale_, size=(n, len(NUMERICAL_FEATURES)))),
+                         columns=NUMERICAL_FEATURES)
+    for feature, cats in zip(CATEGORICAL_FEATURES, encoder.categories_):
+        frame[feature] = rng.choice(cats, size=n)
+    return frame
+
+def _measure(engine, n, out_path):
+    """Load one engine and time it on `n` rows; runs in a fresh process."""
+    import resource
+    from savings_batch import preprocess_batch
+    frame = _sample_inputs(n)
+    started = time.perf_counter()
+    if engine == "numpy":
+        model, scaler, encoder = load_numpy_artifacts()
+    else:
+        from savings_batch import load_keras_artifacts
+        model, scaler, encoder = load_keras_artifacts()
+    load_seconds = time.perf_counter() - started
+    X = preprocess_batch(frame, scaler, encoder)
+    model.predict(X[:1], verbose=0)
+    started = time.perf_counter()
+    for row in X[:200]:
+        model.predict(row[None, :], verbose=0)
+    single_ms = (time.perf_counter() - started) / min(200, n) * 1000
+    started = time.perf_counter()
+    predictions = model.predict(X, batch_size=1024, verbose=0)
+    batch_seconds = time.perf_counter() - started
+    np.save(out_path, predictions)
+    return {"load_seconds": load_seconds, "single_row_ms": single_ms, "batch_seconds": batch_seconds,
+            "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+
+def check_parity(n=10000, rtol=1e-5, atol=1e-3):
+    """Compare the NumPy engine against Keras for accuracy, latency and memory.
+
+    Each engine runs in its own process so load time and peak RSS are not
+    shared. Returns the report and raises AssertionError if the predictions
+    are not close within float32 round-off (`rtol`/`atol`).
+    """
+    report, predictions = {}, {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for engine in ("numpy", "keras"):
+            out_path = os.path.join(tmp, f"{engine}.npy")
+            output = subprocess.run([sys.executable, __file__, "_measure", engine, str(n), out_path],
+                                    capture_output=True, text=True, check=True).stdout
+            report[engine] = json.loads(output.strip().splitlines()[-1])
+            predictions[engine] = np.load(out_path)
+    diff = np.abs(predictions["numpy"] - predictions["keras"])
+    tolerance = atol + rtol * np.abs(predictions["keras"])
+    report["rows"] = n
+    report["max_abs_diff"] = float(diff.max())
+    report["max_abs_prediction"] = float(np.abs(predictions["keras"]).max())
+    assert (diff <= tolerance).all(), report
+    return report
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "export"
+    if command == "export":
+        print(f"Wrote {export_weights()} ({os.path.getsize(WEIGHTS_PATH) / 1024:.1f} KB)")
+    elif command == "check":
+        print(json.dumps(check_parity(), indent=2))
+    elif command == "_measure":
+        print(json.dumps(_measure(sys.argv[2], int(sys.argv[3]), sys.argv[4])))
+    else:
+        sys.exit(f"Unknown command: {command} (expected 'export' or 'check')")
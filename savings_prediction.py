@@ -1,146 +1,115 @@
 import streamlit as st
-import sqlite3
-import pandas as pd
-import tensorflow as tf
 import numpy as np
-from datetime import datetime, timedelta
-import joblib
+import pandas as pd
+import plotly.express as px
+from instrumentation import timer
+from savings_inference import latest_version
+from savings_batch import (CATEGORICAL_FEATURES, NUMERICAL_FEATURES, TARGET_COLUMNS, build_feature_frame,
+                           load_artifacts, predict_frame, preprocess_batch, previous_month, read_prediction,
+                           scenario_grid)
 
-# Load model and preprocessing objects
-@st.cache_resource
-def load_model_and_preprocessors():
-    model = tf.keras.models.load_model("savings_model.h5")
-    scaler = joblib.load("scaler.pkl")
-    encoder = joblib.load("encoder.pkl")
-    return model, scaler, encoder
+# Load model and preprocessing objects. The cache is keyed by the model
+# version, so a newly trained model is served on the next rerun.
+@st.cache_resource(max_entries=2)
+def load_model_and_preprocessors(version):
+    return load_artifacts(version)
 
 def get_previous_month_data(user_id):
     """Fetch average monthly data for the previous month from the database."""
-    conn = sqlite3.connect("xpenseai.db")
-    today = datetime.today()
-    first_of_current_month = today.replace(day=1)
-    last_of_previous_month = first_of_current_month - timedelta(days=1)
-    previous_month = last_of_previous_month.strftime("%Y-%m")
-
-    query = """
-        SELECT category, AVG(amount) as avg_amount
-        FROM expenses
-        WHERE payer_id = ? AND date LIKE ?
-        GROUP BY category
-    """
-    df = pd.read_sql_query(query, conn, params=(user_id, f"{previous_month}%"))
-    conn.close()
-
-    input_data = {
-        "Income": 20000.0,
-        "Age": 30,
-        "Dependents": 1,
-        "Disposable_Income": 15000.0,
-        "Desired_Savings": 5000.0,
-        "Groceries": 0.0,
-        "Transport": 0.0,
-        "Eating_Out": 0.0,
-        "Entertainment": 0.0,
-        "Utilities": 0.0,
-        "Healthcare": 0.0,
-        "Education": 0.0,
-        "Miscellaneous": 0.0,
-        "Occupation": "Professional",  # Adjust if needed
-        "City_Tier": "Tier_1"         # Updated default to a common alternative
-    }
-
-    for _, row in df.iterrows():
-        if row["category"] == "Food":
-            input_data["Groceries"] = row["avg_amount"]
-            input_data["Eating_Out"] = row["avg_amount"] * 0.5
-        elif row["category"] == "Transportation":
-            input_data["Transport"] = row["avg_amount"]
-        elif row["category"] == "Entertainment":
-            input_data["Entertainment"] = row["avg_amount"]
-
-    return input_data
+    return build_feature_frame(previous_month(), [user_id]).iloc[0].to_dict()
 
 def preprocess_input(input_data, scaler, encoder):
-    """Preprocess input data to match training format (17 features)."""
-    numerical_features = [
-        'Income', 'Age', 'Dependents', 'Disposable_Income', 'Desired_Savings',
-        'Groceries', 'Transport', 'Eating_Out', 'Entertainment', 'Utilities',
-        'Healthcare', 'Education', 'Miscellaneous'
-    ]
-    categorical_features = ['Occupation', 'City_Tier']
-
-    # Numerical data
-    numerical_df = pd.DataFrame([[
-        input_data[feat] for feat in numerical_features
-    ]], columns=numerical_features)
-    scaled_numerical = scaler.transform(numerical_df)
-    numerical_array = scaled_numerical[0]
-
-    # Categorical data with error handling
-    categorical_df = pd.DataFrame([[input_data["Occupation"], input_data["City_Tier"]]], columns=categorical_features)
+    """Preprocess input data to match training format (18 features)."""
     try:
-        encoded_cats = encoder.transform(categorical_df).flatten()
+        return preprocess_batch(pd.DataFrame([input_data]), scaler, encoder)
     except ValueError as e:
         st.error(f"Error in categorical encoding: {e}")
-        st.write("Expected categories for 'Occupation':", encoder.categories_[0])
-        st.write("Expected categories for 'City_Tier':", encoder.categories_[1])
+        for feature, categories in zip(CATEGORICAL_FEATURES, encoder.categories_):
+            st.write(f"Expected categories for '{feature}':", categories)
         return None
 
-    # Combine
-    return np.concatenate([numerical_array, encoded_cats]).reshape(1, 18)
-
 def savings_prediction(user_id):
     """Display savings prediction section."""
     st.subheader("Savings Prediction")
-    model, scaler, encoder = load_model_and_preprocessors()
 
-    today = datetime.today()
-    if today.day == 1:
-        st.write("Fetching data for the previous month...")
-        input_data = get_previous_month_data(user_id)
-        preprocessed_input = preprocess_input(input_data, scaler, encoder)
-        if preprocessed_input is not None:
-            prediction = model.predict(preprocessed_input)[0]
-            target_columns = [
-                "Potential_Savings_Groceries", "Potential_Savings_Transport",
-                "Potential_Savings_Eating_Out", "Potential_Savings_Entertainment",
-                "Potential_Savings_Utilities", "Potential_Savings_Healthcare",
-                "Potential_Savings_Education", "Potential_Savings_Miscellaneous"
-            ]
-            for i, output in enumerate(target_columns):
-                st.write(f"{output}: ${prediction[i]:.2f}")
+    # Monthly predictions are computed for all users by savings_batch.py;
+    # the page only reads the stored row.
+    month = previous_month()
+    stored = read_prediction(user_id, month)
+    if stored is not None:
+        st.write(f"Predicted savings based on {month}:")
+        for output in TARGET_COLUMNS:
+            st.write(f"{output}: ${stored[output]:.2f}")
     else:
-        st.write("Month not completed yet.")
-        
-        if st.checkbox("Enter data manually for prediction"):
-            with st.form("manual_prediction_form"):
-                input_data = {
-                    "Income": st.number_input("Income", min_value=0.0, value=20000.0),
-                    "Age": st.number_input("Age", min_value=0, value=30),
-                    "Dependents": st.number_input("Dependents", min_value=0, value=1),
-                    "Disposable_Income": st.number_input("Disposable Income", min_value=0.0, value=15000.0),
-                    "Desired_Savings": st.number_input("Desired Savings", min_value=0.0, value=5000.0),
-                    "Groceries": st.number_input("Groceries", min_value=0.0, value=0.0),
-                    "Transport": st.number_input("Transport", min_value=0.0, value=0.0),
-                    "Eating_Out": st.number_input("Eating Out", min_value=0.0, value=0.0),
-                    "Entertainment": st.number_input("Entertainment", min_value=0.0, value=0.0),
-                    "Utilities": st.number_input("Utilities", min_value=0.0, value=0.0),
-                    "Healthcare": st.number_input("Healthcare", min_value=0.0, value=0.0),
-                    "Education": st.number_input("Education", min_value=0.0, value=0.0),
-                    "Miscellaneous": st.number_input("Miscellaneous", min_value=0.0, value=0.0),
-                    # Adjust these based on training data categories (example placeholders)
-                    "Occupation": st.selectbox("Occupation", ["Professional", "Student", "Other"]),
-                    "City_Tier": st.selectbox("City Tier", ["Tier_1", "Tier_2", "Tier_3"])  # Updated options
-                }
-                if st.form_submit_button("Predict"):
-                    preprocessed_input = preprocess_input(input_data, scaler, encoder)
-                    if preprocessed_input is not None:
+        st.write(f"No prediction stored for {month} yet.")
+
+    if st.checkbox("Enter data manually for prediction"):
+        model, scaler, encoder = load_model_and_preprocessors(latest_version())
+        with st.form("manual_prediction_form"):
+            input_data = {
+                "Income": st.number_input("Income", min_value=0.0, value=20000.0),
+                "Age": st.number_input("Age", min_value=0, value=30),
+                "Dependents": st.number_input("Dependents", min_value=0, value=1),
+                "Disposable_Income": st.number_input("Disposable Income", min_value=0.0, value=15000.0),
+                "Desired_Savings": st.number_input("Desired Savings", min_value=0.0, value=5000.0),
+                "Groceries": st.number_input("Groceries", min_value=0.0, value=0.0),
+                "Transport": st.number_input("Transport", min_value=0.0, value=0.0),
+                "Eating_Out": st.number_input("Eating Out", min_value=0.0, value=0.0),
+                "Entertainment": st.number_input("Entertainment", min_value=0.0, value=0.0),
+                "Utilities": st.number_input("Utilities", min_value=0.0, value=0.0),
+                "Healthcare": st.number_input("Healthcare", min_value=0.0, value=0.0),
+                "Education": st.number_input("Education", min_value=0.0, value=0.0),
+                "Miscellaneous": st.number_input("Miscellaneous", min_value=0.0, value=0.0),
+                "Occupation": st.selectbox("Occupation", list(encoder.categories_[0])),
+                "City_Tier": st.selectbox("City Tier", list(encoder.categories_[1])),
+            }
+            if st.form_submit_button("Predict"):
+                preprocessed_input = preprocess_input(input_data, scaler, encoder)
+                if preprocessed_input is not None:
+                    with timer("section", "savings: model predict"):
                         prediction = model.predict(preprocessed_input)[0]
-                        target_columns = [
-                            "Potential_Savings_Groceries", "Potential_Savings_Transport",
-                            "Potential_Savings_Eating_Out", "Potential_Savings_Entertainment",
-                            "Potential_Savings_Utilities", "Potential_Savings_Healthcare",
-                            "Potential_Savings_Education", "Potential_Savings_Miscellaneous"
-                        ]
-                        for i, output in enumerate(target_columns):
-                            st.write(f"{output}: {prediction[i]:.2f}")
\ No newline at end of file
+                    for i, output in enumerate(TARGET_COLUMNS):
+                        st.write(f"{output}: {prediction[i]:.2f}")
+
+    if st.checkbox("Explore scenarios"):
+        scenario_explorer(user_id)
+
+def _value_range(label, feature, base_value, key):
+    """Show min/max/steps inputs for one varied feature and return the values to try."""
+    low, high, steps = st.columns(3)
+    start = low.number_input(f"{label} from", min_value=0.0, value=0.0, key=f"{key}_min_{feature}")
+    stop = high.number_input(f"{label} to", min_value=0.0, value=max(float(base_value) * 2, 1000.0),
+                             key=f"{key}_max_{feature}")
+    count = steps.slider(f"{label} steps", 2, 100, 25, key=f"{key}_steps")
+    return np.linspace(start, stop, count)
+
+def scenario_explorer(user_id):
+    """Predict savings over a grid of one or two varied inputs and show it as a chart.
+
+    The whole grid goes through the scaler, encoder and model as one
+    batch, so it is redrawn on every change.
+    """
+    model, scaler, encoder = load_model_and_preprocessors(latest_version())
+    base = get_previous_month_data(user_id)
+    base["Occupation"] = st.selectbox("Occupation", list(encoder.categories_[0]), key="scenario_occupation")
+    base["City_Tier"] = st.selectbox("City Tier", list(encoder.categories_[1]), key="scenario_city_tier")
+
+    x_feature = st.selectbox("Vary", NUMERICAL_FEATURES, index=NUMERICAL_FEATURES.index("Income"))
+    x_values = _value_range("X", x_feature, base[x_feature], "scenario_x")
+    others = [feature for feature in NUMERICAL_FEATURES if feature != x_feature]
+    y_feature = st.selectbox("Against", [None, *others], format_func=lambda f: f or "Nothing",
+                             index=others.index("Eating_Out") + 1 if "Eating_Out" in others else 0)
+    y_values = _value_range("Y", y_feature, base[y_feature], "scenario_y") if y_feature else None
+    output = st.selectbox("Show", ["Total", *TARGET_COLUMNS])
+
+    frame = scenario_grid(base, x_feature, x_values, y_feature, y_values)
+    with timer("section", "savings: scenario grid"):
+        predictions = predict_frame(frame, model, scaler, encoder)
+    values = (predictions.sum(axis=1) if output == "Total" else predictions[output]).to_numpy()
+    if y_feature is None:
+        fig = px.line(x=x_values, y=values, labels={"x": x_feature, "y": output})
+    else:
+        fig = px.imshow(values.reshape(len(y_values), len(x_values)), x=x_values, y=y_values, origin="lower",
+                        aspect="auto", labels={"x": x_feature, "y": y_feature, "color": output})
+    st.plotly_chart(fig)
+    st.caption(f"{len(frame)} scenarios predicted in one batch.")
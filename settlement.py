@@ -0,0 +1,59 @@
+import heapq
+
+def net_balances(splits, expenses, payments, by=None):
+    """Compute each user's net balance from splits, expenses and payments.
+
+    A positive balance means the user is owed money, a negative one means
+    the user owes money. Everything is done with grouped pandas operations,
+    so the cost is linear in the number of rows. With `by` (a column of
+    `expenses` and `payments`, e.g. "group_id") balances are kept separate
+    per value of that column and indexed by (by, user_id).
+    """
+    keys = [by] if by else []
+    merged = splits.merge(expenses[["expense_id", "payer_id", *keys]], on="expense_id")
+    owed = merged[merged["user_id"] != merged["payer_id"]]
+
+    def total(frame, user_column, amount_column):
+        return frame.groupby(keys + [user_column])[amount_column].sum().rename_axis(keys + ["user_id"])
+
+    balances = (total(owed, "payer_id", "share_amount")
+                .sub(total(owed, "user_id", "share_amount"), fill_value=0)
+                .add(total(payments, "from_user_id", "amount"), fill_value=0)
+                .sub(total(payments, "to_user_id", "amount"), fill_value=0))
+    return balances.rename("balance")
+
+def settle(balances, tolerance=0.005):
+    """Turn net balances into a short list of (from_id, to_id, amount) transfers.
+
+    Repeatedly matches the largest debtor with the largest creditor, which
+    needs at most one transfer fewer than the number of users with a
+    non-zero balance.
+    """
+    debtors = [(value, user) for user, value in balances.items() if value < -tolerance]
+    creditors = [(-value, user) for user, value in balances.items() if value > tolerance]
+    heapq.heapify(debtors)
+    heapq.heapify(creditors)
+
+    transfers = []
+    while debtors and creditors:
+        debt, debtor = heapq.heappop(debtors)
+        credit, creditor = heapq.heappop(creditors)
+        amount = min(-debt, -credit)
+        transfers.append((int(debtor), int(creditor), round(amount, 2)))
+        if -debt - amount > tolerance:
+            heapq.heappush(debtors, (debt + amount, debtor))
+        if -credit - amount > tolerance:
+            heapq.heappush(creditors, (credit + amount, creditor))
+    return transfers
+
+def settle_frames(splits, expenses, payments):
+    """Compute the settlement transfers for already loaded ledger frames."""
+    return settle(net_balances(splits, expenses, payments))
+
+if __name__ == "__main__":
+    from analysis import calculate_debts
+    from db import get_connection
+    for group_id, name in get_connection().execute("SELECT group_id, name FROM groups ORDER BY group_id").fetchall():
+        print(f"{name}:")
+        for from_id, to_id, amount in calculate_debts(group_id):
+            print(f"  User {from_id} owes User {to_id} {amount:.2f}")
@@ -0,0 +1,242 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from categorizer import categorize_series
+from db import set_db_path, transaction
+from ledger import rebuild_contacts, rebuild_rollups
+from recurring import PERIODS
+
+# Row counts for each preset scale; "rows" is roughly expenses + splits + payments.
+SCALES = {
+    "10k": {"users": 100, "expenses": 6_000, "payments": 500},
+    "100k": {"users": 1_000, "expenses": 60_000, "payments": 5_000},
+    "1m": {"users": 10_000, "expenses": 600_000, "payments": 50_000},
+    "10m": {"users": 100_000, "expenses": 6_000_000, "payments": 500_000},
+}
+
+MERCHANT_WORDS = ["Blue", "Corner", "Golden", "Harbor", "Maple", "Metro", "North", "Sunny", "Urban", "Village"]
+MERCHANT_KINDS = ["Cafe", "Restaurant", "Gas Station", "Fuel Stop", "Cinema", "Movie House",
+                  "Market", "Pharmacy", "Bookstore", "Hardware"]
+
+# Subscriptions that subscribers pay on a fixed rhythm, so recurring.py has
+# series to detect: (merchant, amount in cents, period in recurring.PERIODS).
+SUBSCRIPTIONS = [("Movie Stream", 1599, "monthly"), ("Music Box", 999, "monthly"), ("Cloud Storage", 299, "monthly"),
+                 ("Fuel Club", 2500, "monthly"), ("Cafe Pass", 900, "weekly"), ("Home Insurance", 12000, "quarterly")]
+
+def merchant_names():
+    """Return the fixed pool of merchant names expenses are drawn from."""
+    return [f"{word} {kind}" for word in MERCHANT_WORDS for kind in MERCHANT_KINDS]
+
+def _dates(rng, n, start, days):
+    """Draw `n` ISO dates uniformly from the `days` days starting at `start`."""
+    offsets = rng.integers(0, days, size=n)
+    return (np.datetime64(start) + offsets.astype("timedelta64[D]")).astype(str)
+
+def _next_id(c, table):
+    """Return the id AUTOINCREMENT gives the next row of `table`.
+
+    That is one past the highest id ever used, which may belong to a
+    deleted or archived row, so MAX() over the table is not enough.
+    """
+    c.execute("SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence WHERE name = ?", (table,))
+    return c.fetchone()[0] + 1
+
+def _insert_users(c, users, seed):
+    """Insert the synthetic users and return their ids in order."""
+    first = _next_id(c, "users")
+    c.executemany("INSERT INTO users (username, password, email) VALUES (?, ?, ?)",
+                  [(f"synthetic_{seed}_{i}", f"synthetic_{seed}_{i}", None) for i in range(users)])
+    return np.arange(first, first + users)
+
+def _insert_groups(c, user_ids, group_size, seed):
+    """Put consecutive blocks of `group_size` users into groups.
+
+    Returns (group_ids, group_of) where group_of maps each user's position
+    in `user_ids` to the position of their group in group_ids.
+    """
+    first = _next_id(c, "groups")
+    group_of = np.arange(len(user_ids)) // group_size
+    group_ids = np.arange(first, first + group_of[-1] + 1)
+    c.executemany("INSERT INTO groups (group_id, name, created_by) VALUES (?, ?, ?)",
+                  [(int(group_id), f"synthetic_{seed}_group_{i}", int(user_ids[i * group_size]))
+                   for i, group_id in enumerate(group_ids)])
+    c.executemany("INSERT INTO group_members (group_id, user_id) VALUES (?, ?)",
+                  zip(group_ids[group_of].tolist(), user_ids.tolist()))
+    return group_ids, group_of
+
+def _expense_chunk(rng, user_ids, group_ids, group_of, n, merchants, categories, start, days, shared_ratio):
+    """Generate one chunk of expenses and their equal splits.
+
+    Returns (expenses, splits) where splits refer to expenses by position in
+    the chunk. A `shared_ratio` fraction of expenses belongs to the payer's
+    group and is split equally between the payer and one to three other
+    members, with leftover cents going to the first participants as in
+    ledger.equal_shares. The rest are personal and have no group.
+    """
+    size = np.bincount(group_of)[group_of]
+    group_start = np.searchsorted(group_of, group_of)
+    payer = rng.integers(0, len(user_ids), size=n)
+    amount = np.maximum(rng.lognormal(mean=np.log(2500), sigma=0.9, size=n).astype(np.int64), 1)
+    merchant = rng.integers(0, len(merchants), size=n)
+    expenses = pd.DataFrame({
+        "payer_id": user_ids[payer],
+        "amount_cents": amount,
+        "merchant": np.asarray(merchants, dtype=object)[merchant],
+        "date": _dates(rng, n, start, days),
+        "category": np.asarray(categories, dtype=object)[merchant],
+    })
+
+    people = np.where(rng.random(n) < shared_ratio, rng.integers(2, 5, size=n), 1)
+    people = np.minimum(people, size[payer])
+    expenses["group_id"] = np.where(people > 1, group_ids[group_of[payer]], None)
+    offset = rng.integers(0, size[payer] - people + 1)
+    row = np.repeat(np.arange(n), people)
+    slot = np.arange(len(row)) - np.repeat(np.cumsum(people) - people, people)
+    first, local = group_start[payer[row]], payer[row] - group_start[payer[row]]
+    member = first + (local + np.where(slot == 0, 0, offset[row] + slot)) % size[payer[row]]
+    base, extra = amount[row] // people[row], amount[row] % people[row]
+    splits = pd.DataFrame({
+        "row": row,
+        "user_id": user_ids[member],
+        "share_cents": base + (slot < extra),
+    })
+    return expenses, splits
+
+def _subscription_chunk(rng, user_ids, limit, start, days, subscriber_ratio):
+    """Generate the charges of one subscription each for a `subscriber_ratio` fraction of users.
+
+    Each subscriber starts on a random day of the first four weeks and is
+    charged the same amount every period until the end of the date range.
+    At most `limit` charges are returned. Returns (expenses, splits) in the
+    same form as _expense_chunk; the charges are personal, with no group.
+    """
+    subscribers = np.sort(rng.choice(len(user_ids), size=int(len(user_ids) * subscriber_ratio), replace=False))
+    kind = rng.integers(0, len(SUBSCRIPTIONS), size=len(subscribers))
+    merchants, amounts, periods = (np.asarray(column, dtype=object) for column in zip(*SUBSCRIPTIONS))
+    # Every period step is a whole number of months or of days.
+    steps = [PERIODS[period][2].kwds for period in periods]
+    step_months = np.array([step.get("months", 0) + 12 * step.get("years", 0) for step in steps])[kind]
+    step_days = np.array([step.get("days", 0) + 7 * step.get("weeks", 0) for step in steps])[kind]
+
+    # One row per subscriber, one column per possible charge; the day of the month stays put.
+    first = np.datetime64(start, "D") + rng.integers(0, 28, size=len(subscribers))
+    first_month = first.astype("datetime64[M]")
+    k = np.arange(days // 7 + 1)
+    dates = ((first_month[:, None] + k * step_months[:, None]).astype("datetime64[D]")
+             + (first - first_month.astype("datetime64[D]"))[:, None] + k * step_days[:, None])
+    charged = dates < np.datetime64(start, "D") + days
+    row = np.repeat(np.arange(len(subscribers)), charged.sum(axis=1))[:limit]
+    expenses = pd.DataFrame({
+        "payer_id": user_ids[subscribers[row]],
+        "amount_cents": amounts[kind[row]].astype(np.int64),
+        "merchant": merchants[kind[row]],
+        "date": dates[charged][:limit].astype(str),
+        "category": np.asarray(categorize_series(pd.Series(merchants)).tolist(), dtype=object)[kind[row]],
+        "group_id": None,
+    })
+    splits = pd.DataFrame({"row": np.arange(len(expenses)), "user_id": expenses["payer_id"].to_numpy(),
+                           "share_cents": expenses["amount_cents"].to_numpy()})
+    return expenses, splits
+
+def generate(users=1_000, expenses=60_000, payments=5_000, seed=0, start="2024-01-01", days=730,
+             shared_ratio=0.3, group_size=8, subscriber_ratio=0.2, chunksize=200_000):
+    """Populate the current database with reproducible synthetic data.
+
+    The same arguments always produce the same rows. Users are put into
+    groups of `group_size`, and shared expenses and payments stay within
+    the payer's group. A `subscriber_ratio` fraction of users also pays a
+    subscription (see SUBSCRIPTIONS); those charges count towards
+    `expenses`, up to a fifth of them. Expenses, splits and
+    payments are written in bulk in chunks of `chunksize`; balances,
+    spending rollups and contacts are brought up to date at the end, so the
+    result is consistent with what ledger.py would have written row by row.
+    Returns a summary with row counts and elapsed seconds.
+    """
+    started = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    merchants = merchant_names()
+    categories = categorize_series(pd.Series(merchants)).tolist()
+    with transaction() as c:
+        user_ids = _insert_users(c, users, seed)
+        group_ids, group_of = _insert_groups(c, user_ids, group_size, seed)
+    # Each user is in exactly one group, so a balance per user is a balance per (group, user).
+    balances = np.zeros(users, dtype=np.int64)
+    position = {user_id: i for i, user_id in enumerate(user_ids)}
+    split_rows = 0
+
+    def chunks():
+        subscriptions = _subscription_chunk(rng, user_ids, expenses // 5, start, days, subscriber_ratio)
+        yield subscriptions
+        for done in range(len(subscriptions[0]), expenses, chunksize):
+            yield _expense_chunk(rng, user_ids, group_ids, group_of, min(chunksize, expenses - done), merchants,
+                                 categories, start, days, shared_ratio)
+
+    for chunk, splits in chunks():
+        if chunk.empty:
+            continue
+        with transaction() as c:
+            first_id = _next_id(c, "expenses")
+            c.executemany("INSERT INTO expenses (payer_id, amount_cents, merchant, date, category, group_id) "
+                          "VALUES (?, ?, ?, ?, ?, ?)",
+                          zip(chunk["payer_id"].tolist(), chunk["amount_cents"].tolist(),
+                              chunk["merchant"].tolist(), chunk["date"].tolist(), chunk["category"].tolist(),
+                              chunk["group_id"].tolist()))
+            c.executemany("INSERT INTO expense_splits (expense_id, user_id, share_cents) VALUES (?, ?, ?)",
+                          zip((splits["row"] + first_id).tolist(), splits["user_id"].tolist(),
+                              splits["share_cents"].tolist()))
+        owed = splits[splits["user_id"].to_numpy() != chunk["payer_id"].to_numpy()[splits["row"]]]
+        payer_index = chunk["payer_id"].map(position).to_numpy()[owed["row"]]
+        np.add.at(balances, payer_index, owed["share_cents"].to_numpy())
+        np.subtract.at(balances, owed["user_id"].map(position).to_numpy(), owed["share_cents"].to_numpy())
+        split_rows += len(splits)
+
+    size = np.bincount(group_of)[group_of]
+    group_start = np.searchsorted(group_of, group_of)
+    for done in range(0, payments, chunksize):
+        n = min(chunksize, payments - done)
+        sender = rng.integers(0, users, size=n)
+        step = rng.integers(1, np.maximum(size[sender], 2))
+        receiver = group_start[sender] + (sender - group_start[sender] + step) % size[sender]
+        amount = np.maximum(rng.lognormal(mean=np.log(2000), sigma=0.8, size=n).astype(np.int64), 1)
+        valid = sender != receiver
+        sender, receiver, amount = sender[valid], receiver[valid], amount[valid]
+        with transaction() as c:
+            c.executemany("INSERT INTO payments (from_user_id, to_user_id, amount_cents, date, group_id) "
+                          "VALUES (?, ?, ?, ?, ?)",
+                          zip(user_ids[sender].tolist(), user_ids[receiver].tolist(), amount.tolist(),
+                              _dates(rng, len(amount), start, days).tolist(), group_ids[group_of[sender]].tolist()))
+        np.add.at(balances, sender, amount)
+        np.subtract.at(balances, receiver, amount)
+
+    with transaction() as c:
+        c.executemany("""
+            INSERT INTO balances (group_id, user_id, balance_cents) VALUES (?, ?, ?)
+            ON CONFLICT(group_id, user_id) DO UPDATE SET balance_cents = balance_cents + excluded.balance_cents
+        """, [(int(group_ids[group_of[i]]), int(user_ids[i]), int(balances[i])) for i in np.flatnonzero(balances)])
+    rebuild_rollups()
+    rebuild_contacts()
+    return {"users": users, "groups": len(group_ids), "expenses": expenses, "splits": split_rows, "payments": payments,
+            "first_user_id": int(user_ids[0]), "seconds": round(time.perf_counter() - started, 2)}
+
+if __name__ == "__main__":
+    from db_init import init_db
+
+    parser = argparse.ArgumentParser(description="Populate the database with reproducible synthetic data.")
+    parser.add_argument("--db", help="database file to populate (default: XPENSEAI_DB or xpenseai.db)")
+    parser.add_argument("--scale", choices=SCALES, default="10k", help="preset row counts (default: 10k)")
+    parser.add_argument("--users", type=int, help="override the number of users")
+    parser.add_argument("--expenses", type=int, help="override the number of expenses")
+    parser.add_argument("--payments", type=int, help="override the number of payments")
+    parser.add_argument("--group-size", type=int, default=8, help="users per group (default: 8)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.db:
+        set_db_path(args.db)
+    init_db()
+    sizes = dict(SCALES[args.scale])
+    sizes.update({key: getattr(args, key) for key in sizes if getattr(args, key) is not None})
+    summary = generate(seed=args.seed, group_size=args.group_size, **sizes)
+    print(f"Generated {summary['users']} users in {summary['groups']} groups, {summary['expenses']} expenses, {summary['splits']} splits "
+          f"and {summary['payments']} payments in {summary['seconds']}s.")
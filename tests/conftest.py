@@ -0,0 +1,29 @@
+import os
+import sys
+import pytest
+
+# The app modules live at the top level of the repository.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Point the data-access layer at a fresh, migrated database file and an empty archive."""
+    import db
+    import archive
+    from db_init import init_db
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    original = db.DB_PATH
+    db.set_db_path(str(tmp_path / "test.db"))
+    init_db()
+    yield db.get_connection()
+    db.set_db_path(original)
+
+def pytest_addoption(parser):
+    group = parser.getgroup("benchmarks", "XpenseAI benchmarks (tests/test_benchmarks.py)")
+    group.addoption("--benchmark", action="store_true", help="run the benchmarks, which are skipped by default")
+    group.addoption("--benchmark-scale", default="10k", help="synthetic dataset size (default: 10k)")
+    group.addoption("--benchmark-db", help="benchmark an existing database instead (it is written to)")
+    group.addoption("--benchmark-repeat", type=int, default=5)
+    group.addoption("--benchmark-output", default="benchmark_results.json",
+                    help="where to write the JSON report (default: benchmark_results.json)")
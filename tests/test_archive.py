@@ -0,0 +1,39 @@
+import io
+import os
+import archive
+from archive import archive_before, archived_months, read_archive, restore_month
+from csv_import import import_csv
+from db import transaction
+from ledger import add_expense, verify_balances, verify_rollups
+
+CSV = "2025-01-03,Cafe,3.50,Food\n2025-01-03,Cafe,3.50,Food\n2025-02-10,Bakery,4,Food\n"
+
+def table(db, name):
+    return sorted(db.execute(f"SELECT * FROM {name}").fetchall(), key=repr)
+
+def test_archive_restore_round_trip(db):
+    import_csv(io.StringIO(CSV), 1)
+    with transaction() as c:
+        add_expense(c, 2, 20, "Dinner", "2025-01-20", "Food", [(1, 10), (2, 10)], group_id=1)
+        add_expense(c, 1, 2, "Kiosk", None, "Food", [(1, 2)])
+    expenses, splits = table(db, "expenses"), table(db, "expense_splits")
+
+    assert archive_before("2025-02") == {"2025-01": 3}
+    assert db.execute("SELECT COUNT(*) FROM expenses").fetchone()[0] == 2
+    assert archived_months()[["month", "expenses", "splits"]].values.tolist() == [["2025-01", 3, 4]]
+    archived = read_archive("expenses", ["expense_id", "merchant"], payer_id=2)
+    assert archived.values.tolist() == [[4, "Dinner"]]
+    assert verify_balances().empty and verify_rollups().empty
+
+    # The archived rows' hashes still make a re-import a no-op.
+    stats = import_csv(io.StringIO(CSV), 1)
+    assert (stats["inserted"], stats["skipped"]) == (0, 3)
+
+    assert restore_month("2025-01") == 3
+    assert table(db, "expenses") == expenses
+    assert table(db, "expense_splits") == splits
+    assert table(db, "archive_parts") == [] and table(db, "archived_import_hashes") == []
+    assert os.listdir(archive.ARCHIVE_DIR) == []
+    assert verify_balances().empty and verify_rollups(include_archive=False).empty
+    assert import_csv(io.StringIO(CSV), 1)["inserted"] == 0
+    assert restore_month("2025-01") == 0
@@ -0,0 +1,57 @@
+import json
+import pytest
+import benchmarks
+
+# Slow; run with `pytest tests/test_benchmarks.py --benchmark`. The report
+# is written in the same format as `python benchmarks.py`.
+
+@pytest.fixture(scope="module")
+def options(request):
+    config = request.config
+    if not config.getoption("--benchmark"):
+        pytest.skip("benchmarks run only with --benchmark")
+    return {"scale": config.getoption("--benchmark-scale"), "db": config.getoption("--benchmark-db"),
+            "repeat": config.getoption("--benchmark-repeat"), "output": config.getoption("--benchmark-output")}
+
+@pytest.fixture(scope="module")
+def results(options):
+    """Collect every benchmark's timings on one database and write the report at the end."""
+    results = {}
+    with benchmarks.benchmark_db(options["scale"], options["db"]) as sizes:
+        yield results
+    with open(options["output"], "w") as f:
+        json.dump(benchmarks.report(options["scale"], options["db"], sizes, results), f, indent=2)
+
+def timings(entries):
+    return [entry.get("median_ms", entry.get("ms")) for entry in entries.values()]
+
+def test_ledger(results, options):
+    entries = benchmarks.bench_ledger(options["repeat"])
+    results.update(entries)
+    assert all(ms > 0 for ms in timings(entries))
+
+def test_writes(results):
+    entries = benchmarks.bench_writes(2_000, 16)
+    results.update(entries)
+    assert entries["writes_queued"]["failed"] == 0
+
+def test_categorizer(results, options):
+    entries = benchmarks.bench_categorizer(10_000, options["repeat"])
+    results.update(entries)
+    assert all(ms > 0 for ms in timings(entries))
+
+def test_prediction(results, options):
+    entries = benchmarks.bench_prediction(10_000, options["repeat"])
+    results.update(entries)
+    assert all(ms > 0 for ms in timings(entries))
+
+def test_csv_import(results, options):
+    entries = benchmarks.bench_csv_import(20_000, min(options["repeat"], 3))
+    results.update(entries)
+    assert entries["csv_import"]["rows_per_second"] > 0
+
+def test_recurring(results):
+    entries = benchmarks.bench_recurring(100)
+    results.update(entries)
+    assert entries["recurring_full"]["series"] > 0
+    assert entries["recurring_incremental"]["users"] > 0
@@ -0,0 +1,33 @@
+import pytest
+import categorizer
+from categorizer import add_rule, categorize_expense, delete_rule
+from db import transaction
+
+@pytest.fixture
+def rules(db):
+    categorizer._checked_at = None
+    with transaction() as c:
+        add_rule(c, "lunch", "Global")
+        add_rule(c, "lunch", "Group", group_id=7)
+        user_rule = add_rule(c, "lunch", "User", user_id=1)
+    return user_rule
+
+def test_user_rules_beat_group_rules_beat_global_ones(rules):
+    assert categorize_expense("Team Lunch", user_id=1, group_id=7) == "User"
+    assert categorize_expense("Team Lunch", user_id=2, group_id=7) == "Group"
+    assert categorize_expense("Team Lunch", user_id=2, group_id=8) == "Global"
+    assert categorize_expense("Team Lunch") == "Global"
+
+def test_cached_lookups_do_not_read_the_rules_version(rules, monkeypatch):
+    categorize_expense("Team Lunch", user_id=1)
+    calls = []
+    monkeypatch.setattr(categorizer, "get_version", lambda key: calls.append(key))
+    for _ in range(100):
+        categorize_expense("Team Lunch", user_id=1)
+    assert calls == []
+
+def test_rule_changes_apply_to_the_next_lookup(rules):
+    assert categorize_expense("Team Lunch", user_id=1) == "User"
+    with transaction() as c:
+        delete_rule(c, rules, user_id=1)
+    assert categorize_expense("Team Lunch", user_id=1) == "Global"
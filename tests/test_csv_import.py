@@ -0,0 +1,28 @@
+import io
+from csv_import import import_csv
+
+def expenses(db):
+    return db.execute("SELECT date, merchant, amount_cents FROM expenses ORDER BY expense_id").fetchall()
+
+def test_reimport_skips_rows_but_keeps_repeats(db):
+    body = "2025-01-02,Cafe,3.50,\n01/02/2025,Cafe,3.50,\n2025-01-03,Bakery,2,Food\n"
+    assert import_csv(io.StringIO(body), 1)["inserted"] == 3
+    stats = import_csv(io.StringIO(body), 1)
+    assert (stats["inserted"], stats["skipped"]) == (0, 3)
+    assert expenses(db) == [("2025-01-02", "Cafe", 350), ("2025-01-02", "Cafe", 350), ("2025-01-03", "Bakery", 200)]
+
+def test_chunk_without_any_date(db):
+    stats = import_csv(io.StringIO(",Corner Shop,5,\n,Corner Shop,5,\n"), 1)
+    assert (stats["inserted"], stats["skipped"], stats["invalid"]) == (2, 0, 0)
+    assert expenses(db) == [(None, "Corner Shop", 500)] * 2
+
+def test_undated_repeats_in_a_mixed_chunk(db):
+    body = "2025-01-01,Market,1,\n,Corner Shop,5,\n,Corner Shop,5,\n,Corner Shop,5,\n"
+    assert import_csv(io.StringIO(body), 1)["inserted"] == 4
+    assert expenses(db)[1:] == [(None, "Corner Shop", 500)] * 3
+    assert import_csv(io.StringIO(body), 1)["skipped"] == 4
+
+def test_blank_dates_across_chunks(db):
+    body = ",Corner Shop,5,\n" * 3 + "2025-01-01,Market,1,\n"
+    assert import_csv(io.StringIO(body), 1, chunksize=2)["inserted"] == 4
+    assert import_csv(io.StringIO(body), 1, chunksize=2)["skipped"] == 4
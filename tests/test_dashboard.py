@@ -0,0 +1,21 @@
+from dashboard import data_version
+from db import transaction
+from ledger import add_expense, rebuild_rollups
+from recurring import update_recurring
+
+def test_data_version_changes_only_for_the_affected_user(db):
+    first, second = data_version(1), data_version(2)
+    with transaction() as c:
+        add_expense(c, 1, 9.99, "Streaming", "2025-01-01", "Entertainment", [(1, 9.99)])
+    assert data_version(1) != first
+    assert data_version(2) == second
+
+    first, second = data_version(1), data_version(2)
+    update_recurring()
+    assert data_version(1) != first
+    assert data_version(2) == second
+
+    first, second = data_version(1), data_version(2)
+    rebuild_rollups()
+    assert data_version(1) != first
+    assert data_version(2) != second
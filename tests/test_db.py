@@ -0,0 +1,16 @@
+import pytest
+from db import PRAGMAS, get_connection, transaction
+
+def test_lock_wait_comes_from_the_busy_timeout_pragma(db):
+    assert "PRAGMA busy_timeout = 5000" in PRAGMAS
+    assert get_connection().execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+
+def test_nested_transactions_join_the_outer_one(db):
+    with pytest.raises(RuntimeError):
+        with transaction() as c:
+            c.execute("INSERT INTO categories (name) VALUES ('Outer')")
+            with transaction() as inner:
+                inner.execute("INSERT INTO categories (name) VALUES ('Inner')")
+            raise RuntimeError
+    assert db.execute("SELECT COUNT(*) FROM categories WHERE name IN ('Outer', 'Inner')").fetchone()[0] == 0
+    assert not db.in_transaction
@@ -0,0 +1,49 @@
+import sqlite3
+import db
+from db_init import MIGRATIONS, _migration_1_initial_schema, init_db
+from ledger import verify_balances, verify_rollups
+
+def test_baseline_database_is_migrated(tmp_path, monkeypatch):
+    import archive
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    path = str(tmp_path / "baseline.db")
+    conn = sqlite3.connect(path)
+    _migration_1_initial_schema(conn.cursor())
+    conn.executemany("INSERT INTO users (username, password) VALUES (?, 'x')", [("ann",), ("ben",)])
+    conn.executemany("INSERT INTO expenses (payer_id, amount, merchant, date, category) VALUES (?, ?, ?, ?, ?)", [
+        (1, 12.34, "Cafe", "2025-01-05", "Food"),
+        (1, 0.1 + 0.2, "Kiosk", "01/31/2025", "Food"),
+        (2, 19.99, "Cinema", "3 Feb 2025", "Entertainment"),
+        (2, 5.005, "Bakery", "Feb 4, 2025", None),
+        (1, 7.0, "Market", "someday", "Food"),
+        (2, 1.5, "Bus", None, "Transportation"),
+    ])
+    conn.executemany("INSERT INTO expense_splits (expense_id, user_id, share_amount) VALUES (?, ?, ?)",
+                     [(1, 1, 6.17), (1, 2, 6.17), (3, 1, 10.0), (3, 2, 9.99)])
+    conn.execute("INSERT INTO payments (from_user_id, to_user_id, amount, date) VALUES (2, 1, 2.5, '02/10/2025')")
+    conn.commit()
+    conn.close()
+
+    original = db.DB_PATH
+    db.set_db_path(path)
+    try:
+        init_db()
+        c = db.get_connection()
+        assert c.execute("PRAGMA user_version").fetchone()[0] == len(MIGRATIONS)
+        assert c.execute("SELECT amount_cents, date, month FROM expenses ORDER BY expense_id").fetchall() == [
+            (1234, "2025-01-05", "2025-01"),
+            (30, "2025-01-31", "2025-01"),
+            (1999, "2025-02-03", "2025-02"),
+            (501, "2025-02-04", "2025-02"),
+            (700, "someday", None),
+            (150, None, None),
+        ]
+        assert c.execute("SELECT expense_id, user_id, share_cents FROM expense_splits ORDER BY expense_id, user_id"
+                         ).fetchall() == [(1, 1, 617), (1, 2, 617), (3, 1, 1000), (3, 2, 999)]
+        assert c.execute("SELECT amount_cents, date FROM payments").fetchall() == [(250, "2025-02-10")]
+        assert verify_balances().empty
+        assert verify_rollups().empty
+        init_db()
+        assert c.execute("PRAGMA user_version").fetchone()[0] == len(MIGRATIONS)
+    finally:
+        db.set_db_path(original)
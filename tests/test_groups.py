@@ -0,0 +1,45 @@
+import pytest
+from analysis import calculate_debts
+from db import transaction
+from groups import add_member, create_group, group_members, is_member, user_groups
+from ledger import add_expense, add_payment, compute_balances, read_balances
+from user_lookup import clear_cache, search_users
+
+@pytest.fixture
+def groups(db):
+    db.executemany("INSERT INTO users (username, password) VALUES (?, 'x')",
+                   [("ann",), ("Ben",), ("cat",), ("dan",)])
+    with transaction() as c:
+        trip = create_group(c, "Trip", 1, [2, 3])
+        flat = create_group(c, "Flat", 1, [4])
+    clear_cache()
+    return trip, flat
+
+def test_membership(groups):
+    trip, flat = groups
+    assert is_member(trip, 3) and not is_member(flat, 3)
+    assert user_groups(1) == [(flat, "Flat"), (trip, "Trip")]
+    assert user_groups(3) == [(trip, "Trip")]
+    with transaction() as c:
+        add_member(c, flat, 2)
+        add_member(c, flat, 2)
+    assert group_members(flat) == [(1, "ann"), (2, "Ben"), (4, "dan")]
+
+def test_group_search_only_finds_other_members(groups):
+    trip, flat = groups
+    assert search_users(1, "", group_id=trip) == ([(2, "Ben"), (3, "cat")], False)
+    assert search_users(1, "b", group_id=trip) == ([(2, "Ben")], False)
+    assert search_users(1, "dan", group_id=trip) == ([], False)
+    assert search_users(3, "", group_id=flat) == ([(1, "ann"), (4, "dan")], False)
+
+def test_balances_are_kept_per_group(groups):
+    trip, flat = groups
+    with transaction() as c:
+        add_expense(c, 1, 30, "Hotel", "2025-03-01", "Travel", [(1, 10), (2, 10), (3, 10)], group_id=trip)
+        add_payment(c, 2, 1, 10, "2025-03-02", group_id=trip)
+        add_expense(c, 4, 50, "Rent", "2025-03-01", "Housing", [(1, 25), (4, 25)], group_id=flat)
+    assert read_balances(trip).to_dict() == {1: 10.0, 3: -10.0}
+    assert read_balances(flat).to_dict() == {1: -25.0, 4: 25.0}
+    assert calculate_debts(trip) == [(3, 1, 10.0)]
+    assert calculate_debts(flat) == [(1, 4, 25.0)]
+    assert compute_balances(trip).loc[trip].to_dict() == {1: 10.0, 2: 0.0, 3: -10.0}
@@ -0,0 +1,58 @@
+from db import transaction
+from ledger import (add_expense, add_payment, equal_shares, read_balances, rebuild_balances, verify_balances,
+                    verify_rollups)
+
+def test_incremental_balances_match_a_rebuild(db):
+    with transaction() as c:
+        add_expense(c, 1, 30, "Dinner", "2025-01-05", "Food", equal_shares(30, [1, 2, 3]), group_id=1)
+        add_expense(c, 2, 10, "Taxi", "2025-01-06", "Transport", equal_shares(10, [1, 2, 3]), group_id=1)
+        add_expense(c, 3, 7, "Coffee", "2025-01-06", "Food", [(3, 7)])
+        add_payment(c, 2, 1, 5, "2025-01-07", group_id=1)
+        add_expense(c, 4, 12.5, "Tickets", "2025-02-01", "Entertainment", [(1, 6.25), (4, 6.25)], group_id=2)
+        add_payment(c, 4, 4, 3, "2025-02-02", group_id=2)
+        add_payment(c, 1, 4, 6.25, "2025-02-03", group_id=2)
+    with transaction() as c:
+        add_expense(c, 3, 9, "Groceries", "2025-01-08", "Food", [(1, 4.5), (3, 4.5)], group_id=1)
+
+    assert verify_balances().empty
+    assert read_balances(1).to_dict() == {1: 7.16, 2: 1.67, 3: -8.83}
+    assert read_balances(2).empty
+    rebuild_balances()
+    assert read_balances(1).to_dict() == {1: 7.16, 2: 1.67, 3: -8.83}
+
+def rollups(db):
+    return db.execute("SELECT user_id, month, category, total_cents, expense_count FROM spending_rollups "
+                      "ORDER BY user_id, month, category").fetchall()
+
+def test_rollups_follow_inserts_archives_and_restores(db):
+    import io
+    from archive import archive_month, restore_month
+    from csv_import import import_csv
+    with transaction() as c:
+        add_expense(c, 1, 30, "Dinner", "2025-01-05", "Food", equal_shares(30, [1, 2]), group_id=1)
+        add_expense(c, 2, 4, "Bus", "2025-02-01", None, [(2, 4)])
+        add_expense(c, 1, 2, "Kiosk", None, "Food", [(1, 2)])
+    import_csv(io.StringIO("2025-01-09,Cinema,12,Entertainment\n2025-02-11,Cinema,8,Entertainment\n"), 1)
+    assert rollups(db) == [
+        (1, "", "Food", 200, 1),
+        (1, "2025-01", "Entertainment", 1200, 1),
+        (1, "2025-01", "Food", 3000, 1),
+        (1, "2025-02", "Entertainment", 800, 1),
+        (2, "2025-02", "Uncategorized", 400, 1),
+    ]
+    assert verify_rollups().empty
+    before = rollups(db)
+
+    assert archive_month("2025-01") == 2
+    assert rollups(db) == before
+    assert verify_rollups().empty
+    assert not verify_rollups(include_archive=False).empty
+    with transaction() as c:
+        add_expense(c, 1, 5, "Cafe", "2025-01-20", "Food", [(1, 5)])
+    assert verify_rollups().empty
+
+    assert restore_month("2025-01") == 2
+    assert verify_rollups().empty
+    assert verify_rollups(include_archive=False).empty
+    assert dict(((user, month, category), total) for user, month, category, total, _ in rollups(db))[
+        (1, "2025-01", "Food")] == 3500
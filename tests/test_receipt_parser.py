@@ -0,0 +1,12 @@
+import os
+import json
+import pytest
+from conftest import ROOT
+from receipt_parser import parse_receipt
+
+with open(os.path.join(ROOT, "receipt_fixtures.json")) as f:
+    FIXTURES = json.load(f)
+
+@pytest.mark.parametrize("fixture", FIXTURES, ids=[fixture["merchant"] for fixture in FIXTURES])
+def test_parse_receipt(fixture):
+    assert parse_receipt(fixture["text"]) == (fixture["amount"], fixture["merchant"], fixture["date"])
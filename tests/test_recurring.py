@@ -0,0 +1,58 @@
+import pandas as pd
+from archive import archive_before
+from db import transaction
+from ledger import add_expense
+from recurring import detect, update_recurring, upcoming_charges
+
+def charge(c, user_id, merchant, day, amount, category="Subscriptions"):
+    add_expense(c, user_id, amount, merchant, day.strftime("%Y-%m-%d"), category, [(user_id, amount)])
+
+def stored_series(db):
+    return db.execute("SELECT user_id, merchant_key, period, amount_cents, charges, first_date, last_date, next_date "
+                      "FROM recurring_series ORDER BY user_id, merchant_key").fetchall()
+
+def test_detect_finds_regular_charges():
+    expenses = pd.DataFrame({
+        "payer_id": [1] * 4 + [1] * 3,
+        "merchant": ["NETFLIX.COM 866-579", "Netflix.com", "NETFLIX.COM 866-580", "Netflix.com",
+                     "Corner Shop", "Corner Shop", "Corner Shop"],
+        "date": ["2025-01-05", "2025-02-05", "2025-03-06", "2025-04-05", "2025-01-02", "2025-01-09", "2025-03-30"],
+        "amount_cents": [1599, 1599, 1599, 1599, 500, 700, 400],
+        "category": ["Subscriptions"] * 4 + ["Food"] * 3,
+    })
+    series = detect(expenses)
+    assert series[["user_id", "period", "amount_cents", "charges", "next_date"]].values.tolist() == [
+        [1, "monthly", 1599, 4, "2025-05-05"]]
+
+def test_incremental_runs_match_a_full_run(db):
+    db.executemany("INSERT INTO users (username, password) VALUES (?, 'x')", [("ann",), ("ben",), ("cat",)])
+    months = pd.date_range("2025-01-05", periods=4, freq="MS") + pd.Timedelta(days=4)
+    weeks = pd.date_range("2025-01-06", periods=6, freq="W-MON")
+    with transaction() as c:
+        for day in months:
+            charge(c, 1, "NETFLIX.COM 866-579", day, 15.99)
+        for day in weeks[:3]:
+            charge(c, 2, "City Gym", day, 9.5, "Health")
+        charge(c, 3, "Corner Shop", weeks[0], 5, "Food")
+    update_recurring()
+    assert [row[2] for row in stored_series(db)] == ["monthly", "weekly"]
+
+    # Older months move to the archive, which detection must still read.
+    archive_before("2025-03")
+    with transaction() as c:
+        charge(c, 1, "Netflix.com", months[-1] + pd.DateOffset(months=1), 15.99)
+        for day in weeks[3:]:
+            charge(c, 2, "CITY GYM #12", day, 9.5, "Health")
+        for day in months:
+            charge(c, 3, "Spotify", day, 9.99)
+    assert update_recurring()["pairs"] == 3
+    incremental = stored_series(db)
+    assert update_recurring()["expenses"] == 0
+    assert stored_series(db) == incremental
+
+    update_recurring(full=True)
+    assert stored_series(db) == incremental
+    assert [(row[0], row[2], row[4]) for row in incremental] == [(1, "monthly", 5), (2, "weekly", 6),
+                                                                   (3, "monthly", 4)]
+    upcoming = upcoming_charges(2, days=14, today="2025-02-11")
+    assert upcoming["date"].tolist() == ["2025-02-17", "2025-02-24"]
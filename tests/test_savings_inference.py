@@ -0,0 +1,61 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import ROOT
+from savings_batch import CATEGORICAL_FEATURES, DEFAULT_INPUT, NUMERICAL_FEATURES, preprocess_batch
+from savings_inference import NumpyModel, load_numpy_artifacts
+
+ROWS = [
+    DEFAULT_INPUT,
+    {**DEFAULT_INPUT, "Income": 55000.0, "Age": 42, "Dependents": 3, "Disposable_Income": 30000.0,
+     "Groceries": 6000.0, "Transport": 2500.0, "Eating_Out": 1800.0, "Utilities": 2200.0,
+     "Occupation": "Self_Employed", "City_Tier": "Tier_2"},
+    {**DEFAULT_INPUT, "Income": 12000.0, "Age": 21, "Dependents": 0, "Disposable_Income": 4000.0,
+     "Desired_Savings": 800.0, "Entertainment": 900.0, "Miscellaneous": 400.0,
+     "Occupation": "Student", "City_Tier": "Tier_3"},
+]
+# savings_model.h5 predictions for ROWS, from the Keras model.
+EXPECTED = np.array([
+    [0.683, 0.506, 0.445, 0.423, 0.508, 0.228, 0.365, 0.612],
+    [1151.491, 600.554, 316.932, 325.666, 548.774, 57.37, 84.541, 180.437],
+    [180.553, 91.852, 46.366, 46.041, 84.562, 8.978, 11.032, 27.905],
+])
+
+@pytest.fixture(scope="module")
+def artifacts():
+    return load_numpy_artifacts(os.path.join(ROOT, "savings_model.npz"))
+
+def test_preprocessing_matches_sklearn(artifacts):
+    joblib = pytest.importorskip("joblib")
+    _, scaler, encoder = artifacts
+    frame = pd.DataFrame(ROWS)
+    sk_scaler, sk_encoder = joblib.load(os.path.join(ROOT, "scaler.pkl")), joblib.load(os.path.join(ROOT, "encoder.pkl"))
+    np.testing.assert_allclose(scaler.transform(frame[NUMERICAL_FEATURES]),
+                               sk_scaler.transform(frame[NUMERICAL_FEATURES]))
+    np.testing.assert_array_equal(encoder.transform(frame[CATEGORICAL_FEATURES]),
+                                  sk_encoder.transform(frame[CATEGORICAL_FEATURES]))
+
+def test_predictions_match_keras(artifacts):
+    model, scaler, encoder = artifacts
+    predictions = model.predict(preprocess_batch(pd.DataFrame(ROWS), scaler, encoder))
+    np.testing.assert_allclose(predictions, EXPECTED, rtol=1e-4, atol=2e-3)
+
+def test_unknown_activation_is_rejected():
+    model = NumpyModel([(np.eye(2, dtype=np.float32), np.zeros(2, dtype=np.float32), "tanh")])
+    with pytest.raises(ValueError, match="tanh"):
+        model.predict(np.ones((1, 2)))
+
+def test_identity_activations():
+    kernel, bias = np.eye(2, dtype=np.float32), np.zeros(2, dtype=np.float32)
+    for activation in ("linear", "None", None):
+        np.testing.assert_array_equal(NumpyModel([(kernel, bias, activation)]).predict([[-1.0, 2.0]]), [[-1.0, 2.0]])
+
+def test_load_rejects_unknown_activation(artifacts, tmp_path):
+    with np.load(os.path.join(ROOT, "savings_model.npz")) as data:
+        arrays = dict(data)
+    arrays["activations"] = np.array(["relu", "relu", "sigmoid", "linear"])
+    path = tmp_path / "model.npz"
+    np.savez(path, **arrays)
+    with pytest.raises(ValueError, match="sigmoid"):
+        load_numpy_artifacts(str(path))
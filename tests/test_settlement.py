@@ -0,0 +1,55 @@
+import pandas as pd
+import pytest
+from settlement import net_balances, settle
+
+# Small hand-built ledgers. The baseline calculate_debts loop does not
+# terminate on them, so the expected results are worked out by hand.
+
+def ledger(expenses, payments=(), group_id=1):
+    """Build the frames net_balances takes from (payer_id, {user_id: share}) and (from, to, amount) tuples."""
+    splits = pd.DataFrame([(expense_id, user_id, share) for expense_id, (_, shares) in enumerate(expenses)
+                           for user_id, share in shares.items()],
+                          columns=["expense_id", "user_id", "share_amount"])
+    expenses = pd.DataFrame([(expense_id, payer_id, group_id) for expense_id, (payer_id, _) in enumerate(expenses)],
+                            columns=["expense_id", "payer_id", "group_id"])
+    payments = pd.DataFrame([(*payment, group_id) for payment in payments],
+                            columns=["from_user_id", "to_user_id", "amount", "group_id"])
+    return splits, expenses, payments
+
+def balances_of(frames):
+    return {int(user): round(value, 2) for user, value in net_balances(*frames).items()}
+
+def test_shared_expense():
+    frames = ledger([(1, {1: 10, 2: 10, 3: 10})])
+    assert balances_of(frames) == {1: 20.0, 2: -10.0, 3: -10.0}
+    assert settle(net_balances(*frames)) == [(2, 1, 10.0), (3, 1, 10.0)]
+
+def test_payments_reduce_debts():
+    frames = ledger([(1, {1: 10, 2: 10, 3: 10}), (2, {1: 15, 2: 15})], payments=[(3, 1, 4)])
+    assert balances_of(frames) == {1: 1.0, 2: 5.0, 3: -6.0}
+    assert settle(net_balances(*frames)) == [(3, 2, 5.0), (3, 1, 1.0)]
+
+def test_self_payment_changes_nothing():
+    frames = ledger([(1, {1: 5, 2: 5})], payments=[(2, 2, 50)])
+    assert balances_of(frames) == {1: 5.0, 2: -5.0}
+    assert settle(net_balances(*frames)) == [(2, 1, 5.0)]
+
+def test_cent_rounding():
+    # $10 split three ways: the leftover cent stays with the payer.
+    frames = ledger([(1, {1: 3.34, 2: 3.33, 3: 3.33})] * 3)
+    assert balances_of(frames) == {1: 19.98, 2: -9.99, 3: -9.99}
+    assert settle(net_balances(*frames)) == [(2, 1, 9.99), (3, 1, 9.99)]
+
+def test_settled_group_needs_no_transfers():
+    frames = ledger([(1, {1: 0.1, 2: 0.2}), (2, {1: 0.3, 2: 0.1})], payments=[(2, 1, 0.2), (1, 2, 0.3)])
+    assert balances_of(frames) == {1: 0.0, 2: 0.0}
+    assert settle(net_balances(*frames)) == []
+
+def test_balances_per_group():
+    first, second = ledger([(1, {1: 10, 2: 10})], group_id=1), ledger([(2, {1: 4, 2: 4})], group_id=2)
+    second[0]["expense_id"] += 1
+    second[1]["expense_id"] += 1
+    frames = [pd.concat([a, b], ignore_index=True) for a, b in zip(first, second)]
+    balances = net_balances(*frames, by="group_id")
+    assert balances.to_dict() == pytest.approx({(1, 1): 10.0, (1, 2): -10.0, (2, 1): -4.0, (2, 2): 4.0})
+    assert settle(balances.loc[2]) == [(1, 2, 4.0)]
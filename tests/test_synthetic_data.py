@@ -0,0 +1,11 @@
+from ledger import verify_balances, verify_rollups
+from recurring import update_recurring
+from synthetic_data import generate
+
+def test_generated_data_is_consistent_and_has_subscriptions(db):
+    summary = generate(users=50, expenses=5_000, payments=100, seed=1)
+    assert db.execute("SELECT COUNT(*) FROM expenses").fetchone()[0] == summary["expenses"] == 5_000
+    assert verify_balances().empty
+    assert verify_rollups().empty
+    # Every fifth user pays one subscription, and each is detected.
+    assert update_recurring(full=True)["series"] == 10
@@ -0,0 +1,33 @@
+import pytest
+from db import transaction
+from groups import create_group
+from ledger import add_expense, add_payment, rebuild_contacts
+from user_lookup import clear_cache, search_users
+
+@pytest.fixture
+def people(db):
+    db.executemany("INSERT INTO users (username, password) VALUES (?, 'x')",
+                   [("ann",), ("bob",), ("Bobby",), ("carol",), ("zed",)])
+    with transaction() as c:
+        group_id = create_group(c, "Trip", 1, [2, 3, 4, 5])
+        add_expense(c, 1, 9, "Taxi", "2025-01-01", "Transport", [(1, 3), (2, 3), (3, 3)], group_id=group_id)
+        add_payment(c, 4, 1, 5, "2025-01-02", group_id=group_id)
+    clear_cache()
+    return db
+
+def test_contacts_come_from_shared_expenses_and_payments(people):
+    assert search_users(1) == ([(2, "bob"), (3, "Bobby"), (4, "carol")], False)
+    assert search_users(4) == ([(1, "ann")], False)
+    assert search_users(1, "BO") == ([(2, "bob"), (3, "Bobby")], False)
+    assert search_users(1, "bo", page=0, page_size=1) == ([(2, "bob")], True)
+    assert search_users(1, "bo", page=1, page_size=1) == ([(3, "Bobby")], False)
+
+def test_strangers_are_found_by_full_username_only(people):
+    assert search_users(1, "ze") == ([], False)
+    assert search_users(1, "Zed") == ([(5, "zed")], False)
+    assert search_users(1, "ann") == ([], False)
+
+def test_rebuilt_contacts_match_the_kept_ones(people):
+    kept = people.execute("SELECT * FROM contacts ORDER BY user_id, contact_id").fetchall()
+    rebuild_contacts()
+    assert people.execute("SELECT * FROM contacts ORDER BY user_id, contact_id").fetchall() == kept
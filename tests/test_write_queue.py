@@ -0,0 +1,29 @@
+from concurrent.futures import Future
+import pytest
+import write_queue
+from ledger import add_expense, verify_balances
+
+def failing(c):
+    add_expense(c, 3, 1, "Partial", "2025-01-01", "Food", [(3, 1)])
+    raise ValueError("boom")
+
+def merchants(db):
+    return [row[0] for row in db.execute("SELECT merchant FROM expenses ORDER BY expense_id")]
+
+def test_failing_job_rolls_back_alone(db):
+    jobs = [(Future(), add_expense, (1, 10, "First", "2025-01-01", "Food", [(1, 5), (2, 5)]), {"group_id": 1}),
+            (Future(), failing, (), {}),
+            (Future(), add_expense, (2, 4, "Last", "2025-01-02", "Food", [(2, 4)]), {})]
+    write_queue._write_batch(jobs)
+    first, failed, last = (future for future, *_ in jobs)
+    assert (first.result(), last.result()) == (1, 2)
+    with pytest.raises(ValueError, match="boom"):
+        failed.result()
+    assert merchants(db) == ["First", "Last"]
+    assert verify_balances().empty
+
+def test_run_reraises_the_job_exception(db):
+    with pytest.raises(ValueError, match="must belong to a group"):
+        write_queue.run(add_expense, 1, 10, "Shared", "2025-01-01", "Food", [(1, 5), (2, 5)])
+    assert write_queue.run(add_expense, 1, 10, "Own", "2025-01-01", "Food", [(1, 10)]) is not None
+    assert merchants(db) == ["Own"]
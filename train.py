@@ -0,0 +1,240 @@
+import os
+import copy
+import json
+import time
+import shutil
+import warnings
+import argparse
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from savings_batch import CATEGORICAL_FEATURES, NUMERICAL_FEATURES, TARGET_COLUMNS, preprocess_batch
+from savings_inference import MODELS_DIR, WEIGHTS_PATH, latest_version, load_numpy_artifacts, write_weights
+
+HIDDEN_LAYERS = (128, 64, 32)  # same shape as the network in XpenseAI_model_training.ipynb
+COLUMNS = NUMERICAL_FEATURES + CATEGORICAL_FEATURES + TARGET_COLUMNS
+HOLDOUT_EVERY = 10  # of every 10 rows, one is held out for validation and one for the reported test metrics
+STATE_FILE = "state.joblib"
+
+def stream_rows(csv_paths=(), queries=(), chunksize=10_000):
+    """Yield training rows from CSV files and SQL queries, `chunksize` rows at a time.
+
+    Each source must provide every feature and target column. Rows with a
+    missing value are dropped. Nothing is read until the generator is
+    iterated, so each pass over the data streams it again.
+    """
+    from db import get_connection
+    for path in csv_paths:
+        for chunk in pd.read_csv(path, usecols=COLUMNS, chunksize=chunksize):
+            yield chunk.dropna()
+    for query in queries:
+        for chunk in pd.read_sql_query(query, get_connection(), chunksize=chunksize):
+            yield chunk[COLUMNS].dropna()
+
+def _split(chunks):
+    """Yield (train, validation, test) frames, holding out two of every HOLDOUT_EVERY rows across the stream."""
+    seen = 0
+    for chunk in chunks:
+        slot = np.arange(seen, seen + len(chunk)) % HOLDOUT_EVERY
+        seen += len(chunk)
+        yield chunk[slot > 1], chunk[slot == 0], chunk[slot == 1]
+
+def fit_preprocessors(chunks):
+    """Fit the scaler and encoder in one streamed pass over the training rows.
+
+    The scaler is updated with partial_fit and the encoder's categories are
+    collected chunk by chunk, so only one chunk is in memory at a time.
+    """
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+    scaler, categories = StandardScaler(), [set() for _ in CATEGORICAL_FEATURES]
+    for train, _, _ in _split(chunks):
+        if train.empty:
+            continue
+        scaler.partial_fit(train[NUMERICAL_FEATURES].astype(float))
+        for seen, feature in zip(categories, CATEGORICAL_FEATURES):
+            seen.update(train[feature].astype(str))
+    if not hasattr(scaler, "mean_"):
+        raise ValueError("No training rows found")
+    categories = [sorted(seen) for seen in categories]
+    encoder = OneHotEncoder(categories=categories, drop="first", sparse_output=False)
+    encoder.fit(pd.DataFrame({feature: [cats[0]] for feature, cats in zip(CATEGORICAL_FEATURES, categories)}))
+    return scaler, encoder
+
+def _known(frame, encoder):
+    """Keep the rows whose categorical values the encoder knows."""
+    mask = np.ones(len(frame), dtype=bool)
+    for feature, cats in zip(CATEGORICAL_FEATURES, encoder.categories_):
+        mask &= frame[feature].astype(str).isin(cats).to_numpy()
+    return frame[mask]
+
+def _new_model(seed):
+    from sklearn.neural_network import MLPRegressor
+    return MLPRegressor(hidden_layer_sizes=HIDDEN_LAYERS, activation="relu", solver="adam",
+                        batch_size=64, learning_rate_init=1e-3, random_state=seed)
+
+def _from_weights(path, seed):
+    """Start an MLPRegressor from exported NumPy weights with the same layer sizes."""
+    model, scaler, encoder = load_numpy_artifacts(path)
+    sizes = [kernel.shape[1] for kernel, _, _ in model.layers[:-1]]
+    if tuple(sizes) != HIDDEN_LAYERS:
+        raise ValueError(f"Cannot warm start from {path}: hidden layers {sizes} != {HIDDEN_LAYERS}")
+    mlp = _new_model(seed)
+    # One step on zeros sets up the optimizer; the weights are then
+    # overwritten in place so the optimizer keeps pointing at them.
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)  # batch_size is clipped to the single row
+        mlp.partial_fit(np.zeros((1, model.layers[0][0].shape[0])), np.zeros((1, model.layers[-1][0].shape[1])))
+    for coef, intercept, (kernel, bias, _) in zip(mlp.coefs_, mlp.intercepts_, model.layers):
+        coef[...] = kernel
+        intercept[...] = bias
+    return mlp, scaler, encoder
+
+def load_state(version):
+    """Return (model, scaler, encoder) to continue training from.
+
+    `version` names a directory under MODELS_DIR; "legacy" starts from the
+    exported savings_model.npz that predates versioned models.
+    """
+    if version == "legacy":
+        return _from_weights(WEIGHTS_PATH, seed=0)
+    import joblib
+    return joblib.load(os.path.join(MODELS_DIR, version, STATE_FILE))
+
+def evaluate(model, scaler, encoder, chunks, holdout="validation"):
+    """Return MSE, MAE and per-target MAE on the "validation" or "test" rows of a streamed pass."""
+    squared, absolute, rows = np.zeros(len(TARGET_COLUMNS)), np.zeros(len(TARGET_COLUMNS)), 0
+    for parts in _split(chunks):
+        test = _known(parts[1 if holdout == "validation" else 2], encoder)
+        if test.empty:
+            continue
+        error = model.predict(preprocess_batch(test, scaler, encoder)) - test[TARGET_COLUMNS].to_numpy(float)
+        squared += (error ** 2).sum(axis=0)
+        absolute += np.abs(error).sum(axis=0)
+        rows += len(test)
+    if rows == 0:
+        return {"rows": 0}
+    return {"rows": rows, "mse": float(squared.sum() / (rows * len(TARGET_COLUMNS))),
+            "mae": float(absolute.sum() / (rows * len(TARGET_COLUMNS))),
+            "mae_per_target": dict(zip(TARGET_COLUMNS, (absolute / rows).round(4).tolist()))}
+
+def train(source, epochs=20, patience=3, warm_start=None, seed=0):
+    """Train the savings model over a streamed source and return (state, metrics).
+
+    `source` is a function returning a fresh iterator of row chunks (see
+    stream_rows); every epoch streams it again. With `warm_start` (a
+    version or "legacy"), training continues from that model with its
+    scaler and encoder unchanged, and rows with categories it has never
+    seen are skipped. The weights from the epoch with the lowest validation
+    MSE are kept, stopping after `patience` epochs without improvement. The
+    reported test metrics come from separate rows that play no part in
+    choosing the epoch.
+    """
+    if epochs < 1:
+        raise ValueError("epochs must be at least 1")
+    started = time.perf_counter()
+    if warm_start:
+        model, scaler, encoder = load_state(warm_start)
+    else:
+        scaler, encoder = fit_preprocessors(source())
+        model = _new_model(seed)
+    best, history, train_rows, skipped = None, [], 0, 0
+    for epoch in range(epochs):
+        for train_frame, _, _ in _split(source()):
+            known = _known(train_frame, encoder)
+            skipped += len(train_frame) - len(known)
+            if known.empty:
+                continue
+            model.partial_fit(preprocess_batch(known, scaler, encoder), known[TARGET_COLUMNS].to_numpy(float))
+            train_rows += len(known)
+        validation = evaluate(model, scaler, encoder, source())
+        score = validation.get("mse", float("inf"))
+        history.append(validation.get("mse"))
+        if best is None or score < best[0]:
+            best = (score, validation, copy.deepcopy(model), epoch)
+        elif epoch - best[3] >= patience:
+            break
+    _, validation, model, best_epoch = best
+    metrics = {"warm_start": warm_start, "epochs_run": len(history), "best_epoch": best_epoch + 1,
+               "train_rows_per_epoch": train_rows // len(history), "skipped_rows_per_epoch": skipped // len(history),
+               "validation_mse_history": history, "validation": validation,
+               "test": evaluate(model, scaler, encoder, source(), "test"),
+               "seconds": round(time.perf_counter() - started, 2)}
+    return (model, scaler, encoder), metrics
+
+def save_version(state, metrics, promote=True):
+    """Write a new model version directory and, with `promote`, point LATEST at it.
+
+    The directory is assembled under a temporary name and renamed into
+    place, and LATEST is replaced with os.replace, so the app only ever sees
+    complete versions. Returns the version name.
+    """
+    import joblib
+    model, scaler, encoder = state
+    version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    staging = os.path.join(MODELS_DIR, f".{version}.tmp")
+    os.makedirs(staging)
+    try:
+        steps = [(coef, intercept, "relu") for coef, intercept in zip(model.coefs_, model.intercepts_)]
+        steps[-1] = (*steps[-1][:2], "linear")
+        write_weights(os.path.join(staging, WEIGHTS_PATH), steps, scaler, encoder)
+        joblib.dump(state, os.path.join(staging, STATE_FILE))
+        with open(os.path.join(staging, "metrics.json"), "w") as f:
+            json.dump({"version": version, "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                       **metrics}, f, indent=2)
+        os.replace(staging, os.path.join(MODELS_DIR, version))
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    if promote:
+        promote_version(version)
+    return version
+
+def promote_version(version):
+    """Atomically point MODELS_DIR/LATEST at `version`; the app serves it on its next rerun."""
+    if not os.path.exists(os.path.join(MODELS_DIR, version, WEIGHTS_PATH)):
+        raise ValueError(f"No model version {version} in {MODELS_DIR}")
+    pointer = os.path.join(MODELS_DIR, "LATEST.tmp")
+    with open(pointer, "w") as f:
+        f.write(version + "\n")
+    os.replace(pointer, os.path.join(MODELS_DIR, "LATEST"))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the savings model on CPU from streamed data.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("train", help="train a new model version")
+    run.add_argument("--csv", action="append", default=[], help="training CSV (repeatable)")
+    run.add_argument("--sql", action="append", default=[],
+                     help="SQL query over the app database returning training rows (repeatable)")
+    run.add_argument("--db", help="database for --sql (default: XPENSEAI_DB or xpenseai.db)")
+    run.add_argument("--chunksize", type=int, default=10_000)
+    run.add_argument("--epochs", type=int, default=20)
+    run.add_argument("--patience", type=int, default=3)
+    run.add_argument("--warm-start", nargs="?", const="latest",
+                     help="continue from a version (default: the latest; 'legacy' for savings_model.npz)")
+    run.add_argument("--no-promote", action="store_true", help="write the version without serving it")
+    run.add_argument("--seed", type=int, default=0)
+    promote = commands.add_parser("promote", help="serve an existing version")
+    promote.add_argument("version")
+    args = parser.parse_args()
+
+    if args.command == "promote":
+        promote_version(args.version)
+        print(f"Serving {args.version}.")
+    else:
+        if not args.csv and not args.sql:
+            parser.error("give at least one --csv or --sql source")
+        if args.epochs < 1:
+            parser.error("--epochs must be at least 1")
+        if args.db:
+            from db import set_db_path
+            set_db_path(args.db)
+        warm_start = args.warm_start
+        if warm_start == "latest":
+            warm_start = latest_version() or "legacy"
+        os.makedirs(MODELS_DIR, exist_ok=True)
+        state, metrics = train(lambda: stream_rows(args.csv, args.sql, args.chunksize),
+                               args.epochs, args.patience, warm_start, args.seed)
+        version = save_version(state, metrics, promote=not args.no_promote)
+        print(f"Wrote {MODELS_DIR}/{version} (test MSE {metrics['test'].get('mse', float('nan')):.4f}, "
+              f"MAE {metrics['test'].get('mae', float('nan')):.4f})"
+              + ("" if args.no_promote else " and made it the latest version."))
@@ -1,6 +1,8 @@
 import streamlit as st
-import sqlite3
-from auth import get_users
+from groups import add_member, create_group, group_members, group_select, user_groups
+from ledger import add_payment
+from user_lookup import clear_cache, user_picker
+from write_queue import run
 
 def savings_goals(user_id):
     """Set and display savings goals."""
@@ -15,15 +17,47 @@ def savings_goals(user_id):
 def record_payment(user_id):
     """Record a payment between users."""
     st.subheader("Record Payment")
+    group_id = group_select(user_id, "payment_group")
+    if group_id is None:
+        st.info("Payments are recorded within a group. Create one on the Groups page first.")
+        return
+    users = user_picker(user_id, "payment_users", group_id)
+    del users[user_id]
     with st.form("payment_form"):
-        to_user = st.selectbox("Paid To", get_users())
+        to_user = st.selectbox("Paid To", list(users), format_func=users.get)
         amount = st.number_input("Amount", min_value=0.0)
         date = st.date_input("Date")
         if st.form_submit_button("Record"):
-            conn = sqlite3.connect("xpenseai.db")
-            c = conn.cursor()
-            c.execute("INSERT INTO payments (from_user_id, to_user_id, amount, date) VALUES (?, ?, ?, ?)",
-                      (user_id, to_user, amount, str(date)))
-            conn.commit()
-            conn.close()
-            st.success("Payment recorded!")
\ No newline at end of file
+            if to_user is None:
+                st.error("Find the user you paid first.")
+                return
+            run(add_payment, user_id, to_user, amount, str(date), group_id)
+            clear_cache()  # new contacts show up in the picker straight away
+            st.success("Payment recorded!")
+
+def manage_groups(user_id):
+    """Create groups and add members to the user's groups."""
+    st.subheader("Create Group")
+    with st.form("group_form"):
+        name = st.text_input("Group Name")
+        if st.form_submit_button("Create") and name.strip():
+            run(create_group, name.strip(), user_id)
+            st.success(f"Group '{name.strip()}' created!")
+
+    st.subheader("Your Groups")
+    for group_id, name in user_groups(user_id):
+        with st.expander(name):
+            members = dict(group_members(group_id))
+            st.write(", ".join(members.values()))
+            # Searches the user's contacts; anyone else is found by their full username.
+            users = {other: label for other, label in user_picker(user_id, f"member_{group_id}").items()
+                     if other not in members}
+            with st.form(f"member_form_{group_id}"):
+                new_member = st.selectbox("User", list(users), format_func=users.get)
+                if st.form_submit_button("Add Member"):
+                    if new_member is None:
+                        st.error("Find the user to add first.")
+                    else:
+                        run(add_member, group_id, new_member)
+                        clear_cache()  # the new member shows up in the picker straight away
+                        st.success(f"{users[new_member]} added to {name}!")
\ No newline at end of file
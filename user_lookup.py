@@ -0,0 +1,117 @@
+import time
+import threading
+import streamlit as st
+from db import get_connection
+
+PAGE_SIZE = 20
+CACHE_TTL = 30  # seconds
+CACHE_MAX_ENTRIES = 1024
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+def _cached(key, compute):
+    """Return compute() for `key`, reusing results younger than CACHE_TTL seconds."""
+    now = time.monotonic()
+    with _cache_lock:
+        hit = _cache.get(key)
+    if hit is not None and hit[0] > now:
+        return hit[1]
+    value = compute()
+    with _cache_lock:
+        if len(_cache) >= CACHE_MAX_ENTRIES:
+            _cache.clear()
+        _cache[key] = (now + CACHE_TTL, value)
+    return value
+
+def clear_cache():
+    """Forget every cached search result."""
+    with _cache_lock:
+        _cache.clear()
+
+def find_user(username):
+    """Return (user_id, username) for an exact, case-insensitive username match, or None."""
+    return get_connection().execute(
+        "SELECT user_id, username FROM users WHERE username = ? COLLATE NOCASE", (username,)).fetchone()
+
+def search_users(user_id, prefix="", page=0, page_size=PAGE_SIZE, group_id=None):
+    """Return one page of a user's contacts whose username starts with `prefix`.
+
+    Contacts are the users someone has shared an expense or a payment with,
+    so the cost depends on the size of their circle, not on the total
+    number of users. Someone new can be found by typing their full
+    username, which is looked up through the username index. With
+    `group_id`, only that group's other members are searched and nobody
+    else can be found. Matching is case-insensitive. Returns (rows,
+    has_more) where rows is a list of (user_id, username) pairs ordered by
+    username.
+    """
+    prefix = prefix.strip()
+    return _cached((user_id, group_id, prefix.lower(), page, page_size),
+                   lambda: _search_users(user_id, prefix, page, page_size, group_id))
+
+def _search_users(user_id, prefix, page, page_size, group_id):
+    if group_id is None:
+        source, params = "contacts c JOIN users u ON u.user_id = c.contact_id WHERE c.user_id = ?", (user_id,)
+    else:
+        source = "group_members m JOIN users u ON u.user_id = m.user_id WHERE m.group_id = ? AND m.user_id != ?"
+        params = (group_id, user_id)
+    rows = get_connection().execute(f"""
+        SELECT u.user_id, u.username
+        FROM {source} AND u.username >= ? COLLATE NOCASE AND u.username < ? COLLATE NOCASE
+        ORDER BY u.username COLLATE NOCASE
+        LIMIT ? OFFSET ?
+    """, (*params, prefix, prefix + "\U0010ffff", page_size + 1, page * page_size)).fetchall()
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if prefix and page == 0 and group_id is None:
+        exact = find_user(prefix)
+        if exact is not None and exact[0] != user_id and exact not in rows:
+            rows.insert(0, exact)
+    return rows, has_more
+
+def user_picker(user_id, key, group_id=None):
+    """Show a username search box with paging and return the matching users.
+
+    Returns an {user_id: label} dict for a multiselect or selectbox, with
+    the current user first as "You". With `group_id` only that group's
+    members are offered. Call it outside a form so that typing and paging
+    rerun the page.
+    """
+    prefix = st.text_input("Find user", key=f"{key}_search", placeholder="Start typing a username")
+    page_key = f"{key}_page"
+    if st.session_state.get(f"{key}_searched") != (group_id, prefix):
+        st.session_state[f"{key}_searched"] = (group_id, prefix)
+        st.session_state[page_key] = 0
+    page = st.session_state.get(page_key, 0)
+    rows, has_more = search_users(user_id, prefix, page, group_id=group_id)
+
+    previous, following = st.columns(2)
+    if page > 0 and previous.button("Previous", key=f"{key}_previous"):
+        st.session_state[page_key] = page - 1
+        st.rerun()
+    if has_more and following.button("More", key=f"{key}_more"):
+        st.session_state[page_key] = page + 1
+        st.rerun()
+
+    options = {user_id: "You"}
+    options.update(rows)
+    return options
+
+def user_multiselect(user_id, key, label, group_id=None):
+    """Show a user_picker with a multiselect and return the chosen user ids.
+
+    The picker only offers the current page of search results, so the
+    users chosen so far are kept in session state and always offered too;
+    choices survive new searches and paging. They are forgotten when
+    `group_id` changes. The current user is chosen by default. Call it
+    outside a form so each choice is kept straight away.
+    """
+    state_key = f"{key}_chosen"
+    chosen_group, chosen = st.session_state.get(state_key, (group_id, {user_id: "You"}))
+    if chosen_group != group_id:
+        chosen = {user_id: "You"}
+    options = {**chosen, **user_picker(user_id, key, group_id)}
+    selected = st.multiselect(label, list(options), default=list(chosen), format_func=options.get)
+    st.session_state[state_key] = (group_id, {uid: options[uid] for uid in selected})
+    return selected
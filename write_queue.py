@@ -0,0 +1,89 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from db import transaction
+from instrumentation import record
+
+# Bounded so a burst of writes makes callers wait instead of growing memory.
+MAX_PENDING = int(os.environ.get("XPENSEAI_WRITE_QUEUE_SIZE", "1000"))
+MAX_BATCH = 64
+SUBMIT_TIMEOUT = 10  # seconds to wait for room in a full queue
+RESULT_TIMEOUT = 60  # seconds run() waits for a job to be committed
+
+_queue = queue.Queue(maxsize=MAX_PENDING)
+_writer = None
+_writer_lock = threading.Lock()
+
+def submit(job, *args, **kwargs):
+    """Queue `job(c, *args, **kwargs)` for the writer thread and return a Future.
+
+    `c` is a cursor inside the writer's transaction, so the ledger functions
+    (add_expense, add_payment, ...) can be passed directly. The future
+    resolves to the job's return value once its transaction has committed,
+    or to the exception the job raised. Raises queue.Full if the queue
+    stays full for SUBMIT_TIMEOUT seconds.
+    """
+    _start_writer()
+    future = Future()
+    _queue.put((future, job, args, kwargs), timeout=SUBMIT_TIMEOUT)
+    return future
+
+def run(job, *args, **kwargs):
+    """Submit a job and wait for its result, re-raising its exception."""
+    return submit(job, *args, **kwargs).result(timeout=RESULT_TIMEOUT)
+
+def pending():
+    """Return the number of jobs waiting for the writer."""
+    return _queue.qsize()
+
+def _start_writer():
+    global _writer
+    if _writer is not None and _writer.is_alive():
+        return
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=_write_loop, name="xpenseai-writer", daemon=True)
+            _writer.start()
+
+def _write_loop():
+    """Take whatever jobs are waiting, up to MAX_BATCH, and commit them together."""
+    while True:
+        jobs = [_queue.get()]
+        while len(jobs) < MAX_BATCH:
+            try:
+                jobs.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        started = time.perf_counter()
+        _write_batch([job for job in jobs if job[0].set_running_or_notify_cancel()])
+        record("write", "batch", time.perf_counter() - started, len(jobs))
+
+def _write_batch(jobs):
+    """Run a batch of jobs in one transaction, each inside its own savepoint.
+
+    A job that raises is rolled back to its savepoint and gets the
+    exception; the others still commit. Results are only handed out after
+    the commit, so a caller never sees a write that could still be lost.
+    """
+    outcomes = []
+    try:
+        with transaction() as c:
+            for future, job, args, kwargs in jobs:
+                c.execute("SAVEPOINT job")
+                try:
+                    outcomes.append((future, job(c, *args, **kwargs), None))
+                except Exception as exc:
+                    c.execute("ROLLBACK TO job")
+                    outcomes.append((future, None, exc))
+                c.execute("RELEASE job")
+    except Exception as exc:
+        for future, *_ in jobs:
+            future.set_exception(exc)
+        return
+    for future, result, exc in outcomes:
+        if exc is None:
+            future.set_result(result)
+        else:
+            future.set_exception(exc)